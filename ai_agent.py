@@ -3,160 +3,763 @@ AI Agent Core Module
 Handles conversation and task processing using Hugging Face models
 """
 
+import time
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from typing import List, Dict, Optional
+from threading import Event, Thread
+from transformers import (AutoModelForCausalLM, AutoTokenizer, StoppingCriteria,
+                          StoppingCriteriaList, TextIteratorStreamer)
+from transformers.generation.streamers import BaseStreamer
+from transformers.pytorch_utils import Conv1D
+from typing import List, Dict, Iterator, Optional, Sequence, Tuple
 import config
+import metrics
+from history import TokenHistory
+from batching import BatchingEngine
+from sessions import Session
+from response_cache import ResponseCache
+from model_snapshot import find_snapshot, save_snapshot
 from colorama import Fore, Style, init
 
 init(autoreset=True)
 
+# Fixed replies, also pre-rendered by the speech cache
+FALLBACK_RESPONSE = "I'm not sure how to respond to that."
+ERROR_RESPONSE = "I apologize, I encountered an error processing your request."
+GOODBYE_RESPONSE = "Goodbye! Have a great day!"
+CLEARED_RESPONSE = "I've cleared our conversation history."
+
+
+def quantize_int8(model):
+    """
+    Apply dynamic int8 quantization to a model's linear layers for CPU inference
+    
+    GPT-2 style models (DialoGPT) implement their projections with
+    transformers' Conv1D, so those are first converted to equivalent
+    nn.Linear layers. The output projection is left in float because it
+    shares its weights with the input embeddings.
+    
+    Args:
+        model: Float model on the CPU
+        
+    Returns:
+        The quantized model (modified in place)
+    """
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, child_name, linear)
+    
+    output_embeddings = model.get_output_embeddings()
+    qconfig_spec = {
+        name: torch.ao.quantization.default_dynamic_qconfig
+        for name, module in model.named_modules()
+        if isinstance(module, torch.nn.Linear) and module is not output_embeddings
+    }
+    return torch.ao.quantization.quantize_dynamic(
+        model, qconfig_spec, dtype=torch.qint8, inplace=True
+    )
+
+
+class _StageTimer(BaseStreamer):
+    """
+    Notes when the first new token arrives, splitting prefill from decode
+    
+    generate() passes the prompt to the streamer before any new token, so
+    the second put() marks the end of the prefill. New tokens and the
+    put() calls that delivered them are counted too: with a draft model,
+    each call is one verification pass of the main model. Calls are
+    forwarded to an inner streamer, if any.
+    """
+    
+    def __init__(self, inner: Optional[BaseStreamer] = None):
+        self.inner = inner
+        self.first_token = None
+        self.steps = 0
+        self.tokens = 0
+        self._prompt_seen = False
+    
+    def put(self, value):
+        if not self._prompt_seen:
+            self._prompt_seen = True
+        else:
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            self.steps += 1
+            self.tokens += value.numel()
+        if self.inner is not None:
+            self.inner.put(value)
+    
+    def end(self):
+        if self.inner is not None:
+            self.inner.end()
+
+
+class _StopOnEvent(StoppingCriteria):
+    """Ends generation at the next token once an event is set"""
+    
+    def __init__(self, event: Event):
+        self.event = event
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor,
+                 **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(),
+                          dtype=torch.bool, device=input_ids.device)
+
 
 class AIAgent:
     """Core AI agent using Hugging Face transformers"""
     
-    def __init__(self, model_name: str = config.MODEL_NAME):
+    def __init__(self, model_name: str = config.MODEL_NAME,
+                 session_cache: bool = config.ENABLE_KV_CACHE,
+                 batching: bool = config.ENABLE_BATCHING,
+                 quantize: bool = config.QUANTIZE_INT8,
+                 use_snapshot: bool = config.ENABLE_MODEL_SNAPSHOT,
+                 response_cache: bool = config.ENABLE_RESPONSE_CACHE,
+                 speculative: bool = config.ENABLE_SPECULATIVE_DECODING):
+        """
+        Load the model and tokenizer
+        
+        Args:
+            model_name: Hugging Face model name or local path
+            session_cache: Keep the attention cache between turns so each turn
+                only encodes the new message
+            batching: Route generation through a BatchingEngine so concurrent
+                callers with their own histories share model.generate calls
+            quantize: Quantize linear layers to int8 (CPU only)
+            use_snapshot: Load from (or create) a pre-converted safetensors
+                snapshot under MODELS_DIR instead of rebuilding the model
+            response_cache: Answer prompts seen before (same words, context
+                and settings) with the reply generated then
+            speculative: Load DRAFT_MODEL to propose tokens that the model
+                verifies several at a time (assisted generation)
+        """
         print(f"{Fore.YELLOW}Loading AI model: {model_name}")
         print(f"{Fore.YELLOW}This may take a few moments on first run...")
         
         self.model_name = model_name
-        self.conversation_history = []
+        self.session_cache = session_cache
+        config.ensure_directories()
+        
+        # Conversation used when callers do not pass their own session
+        self.session = Session("default")
+        
+        self.response_cache = None
+        if response_cache:
+            path = config.CACHE_DIR / "responses.json" if config.RESPONSE_CACHE_PERSIST else None
+            self.response_cache = ResponseCache(path=path)
         
         # Load tokenizer and model
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                model_name,
-                cache_dir=str(config.CACHE_DIR)
-            )
+            # Use the GPU if available
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            self.tokenizer, self.model = self._load_pretrained(model_name, use_snapshot)
             
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                cache_dir=str(config.CACHE_DIR),
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                low_cpu_mem_usage=True
-            )
+            self.quantized = False
+            if quantize:
+                if self.device == "cpu":
+                    quantize_int8(self.model)
+                    self.quantized = True
+                else:
+                    print(f"{Fore.YELLOW}int8 quantization is CPU-only; using {self.device} instead")
             
-            # Move model to GPU if available
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.model.to(self.device)
+            print(f"{Fore.GREEN}Model loaded successfully on {self.device}"
+                  f"{' (int8)' if self.quantized else ''}!")
             
-            print(f"{Fore.GREEN}Model loaded successfully on {self.device}!")
+            self.draft_model = None
+            if speculative:
+                self._load_draft_model(config.DRAFT_MODEL, use_snapshot)
             
             # Set padding token
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
             
+            self.engine = BatchingEngine(self.model, self.tokenizer) if batching else None
+            
         except Exception as e:
             print(f"{Fore.RED}Error loading model: {e}")
             raise
     
-    def generate_response(self, user_input: str) -> str:
+    def _load_pretrained(self, model_name: str, use_snapshot: bool):
+        """
+        Load a tokenizer and model onto the agent's device
+        
+        Args:
+            model_name: Hugging Face model name or local path
+            use_snapshot: Load from (or create) a snapshot under MODELS_DIR
+            
+        Returns:
+            The tokenizer and the model
+        """
+        dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        
+        # A snapshot is already in the target dtype and is memory-mapped
+        snapshot = find_snapshot(model_name, dtype) if use_snapshot else None
+        source = str(snapshot) if snapshot else model_name
+        if snapshot and config.VERBOSE:
+            print(f"{Fore.YELLOW}Using model snapshot {snapshot}")
+        
+        tokenizer = AutoTokenizer.from_pretrained(
+            source,
+            cache_dir=str(config.CACHE_DIR)
+        )
+        
+        model = AutoModelForCausalLM.from_pretrained(
+            source,
+            cache_dir=str(config.CACHE_DIR),
+            torch_dtype=dtype,
+            low_cpu_mem_usage=True
+        )
+        model.to(self.device)
+        
+        if use_snapshot and snapshot is None:
+            save_snapshot(model, tokenizer, model_name)
+        
+        return tokenizer, model
+    
+    def _load_draft_model(self, draft_name: str, use_snapshot: bool):
+        """
+        Load the small model that drafts tokens for assisted generation
+        
+        The draft proposes a few tokens cheaply; the main model checks them
+        all in one forward pass and keeps the longest prefix it agrees with,
+        plus one token of its own. Replies are the ones the main model would
+        give (greedy) or follow its distribution (sampling), at fewer
+        main-model passes per token. The draft must share the tokenizer,
+        as DialoGPT small, medium and large do.
+        
+        Args:
+            draft_name: Hugging Face model name or local path of the draft
+            use_snapshot: Load from (or create) a snapshot under MODELS_DIR
+        """
+        if draft_name == self.model_name:
+            print(f"{Fore.YELLOW}Draft model is the main model; speculative decoding disabled")
+            return
+        
+        print(f"{Fore.YELLOW}Loading draft model: {draft_name}")
+        draft_tokenizer, draft_model = self._load_pretrained(draft_name, use_snapshot)
+        if (draft_tokenizer.get_vocab() != self.tokenizer.get_vocab()
+                or draft_model.config.vocab_size != self.model.config.vocab_size):
+            print(f"{Fore.YELLOW}{draft_name} uses a different tokenizer; "
+                  f"speculative decoding disabled")
+            return
+        
+        if self.quantized:
+            quantize_int8(draft_model)
+        
+        # Starting draft length; the heuristic schedule lengthens it while
+        # drafts are accepted and shortens it when they are not
+        draft_model.generation_config.num_assistant_tokens = config.DRAFT_TOKENS
+        draft_model.generation_config.num_assistant_tokens_schedule = "heuristic"
+        
+        # Each draft forward pass proposes one token
+        self._drafted = 0
+        draft_model.register_forward_hook(self._count_draft_pass)
+        self.draft_model = draft_model
+        
+        metrics.SPECULATIVE_ACCEPTANCE.set_function(self._acceptance_rate)
+        print(f"{Fore.GREEN}Speculative decoding with {draft_name}")
+    
+    def _count_draft_pass(self, module, inputs, outputs):
+        self._drafted += 1
+    
+    @staticmethod
+    def _acceptance_rate() -> float:
+        """Share of drafted tokens the main model accepted so far"""
+        drafted = metrics.SPECULATIVE_TOKENS.value(result="drafted")
+        return metrics.SPECULATIVE_TOKENS.value(result="accepted") / drafted if drafted else 0.0
+    
+    def warmup(self):
+        """
+        Run a short throwaway generation
+        
+        The first forward passes pay one-time costs (allocator growth, kernel
+        selection, lazy initialization); doing them at startup keeps them out
+        of the first real reply. The conversation history is not touched.
+        """
+        start = time.perf_counter()
+        inputs = self.tokenizer.encode("Hello" + self.tokenizer.eos_token, return_tensors="pt")
+        
+        with torch.no_grad():
+            self.model.generate(
+                inputs.to(self.device),
+                max_new_tokens=2,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id,
+                assistant_model=self.draft_model,
+            )
+        
+        if config.VERBOSE:
+            print(f"{Fore.YELLOW}Model warm-up took {time.perf_counter() - start:.2f}s")
+    
+    @property
+    def history(self) -> TokenHistory:
+        """History of the default session"""
+        return self.session.history
+    
+    @property
+    def conversation_history(self) -> List[str]:
+        """Decoded messages currently held in the history"""
+        return [
+            self.tokenizer.decode(ids, skip_special_tokens=True).strip()
+            for ids in self.history.messages()
+        ]
+    
+    def _max_input_length(self) -> int:
+        """Prompt token budget, leaving room in the context window for the response"""
+        max_positions = getattr(self.model.config, "max_position_embeddings", None)
+        if max_positions is None:
+            return config.MAX_INPUT_LENGTH
+        # Short-context models keep at least half their window for the prompt
+        reserved = min(config.MAX_RESPONSE_LENGTH, max_positions // 2)
+        return min(config.MAX_INPUT_LENGTH, max_positions - reserved)
+    
+    def _prepare_inputs(self, user_input: str, history: TokenHistory) -> torch.Tensor:
+        """
+        Record user input in the history and build the model prompt
+        
+        Messages are separated by the EOS token, as in DialoGPT's training data.
+        Only the new message is tokenized; earlier turns are reused from the
+        token history, which drops whole turns from the front to fit the budget.
+        
+        Args:
+            user_input: User's text input
+            history: Conversation to add the input to
+            
+        Returns:
+            Token ids of the prompt on the model's device
+        """
+        max_length = self._max_input_length()
+        new_ids = self.tokenizer.encode(user_input + self.tokenizer.eos_token)
+        
+        if not config.ENABLE_CONTEXT_MEMORY:
+            return torch.tensor([new_ids[-max_length:]], device=self.device)
+        
+        # Add user input to conversation history
+        history.add_user_message(new_ids)
+        history.fit(max_length)
+        
+        ids = torch.frombuffer(history.token_ids(), dtype=torch.int32)
+        return ids.to(device=self.device, dtype=torch.long).unsqueeze(0)
+    
+    def _cached_prefix_length(self, inputs: torch.Tensor, session: Session) -> int:
+        """
+        Number of leading prompt tokens covered by the session cache
+        
+        Returns 0 when the cache cannot be used, e.g. after history eviction
+        shifted every remaining token to a new position.
+        """
+        if session.past_key_values is None:
+            return 0
+        
+        cache = session.past_key_values
+        if hasattr(cache, "get_seq_length"):
+            length = cache.get_seq_length()
+        else:
+            length = cache[0][0].shape[-2]
+        
+        # At least one token must be left for the model to process
+        if length >= inputs.shape[-1] or session.cache_ids.shape[-1] < length:
+            return 0
+        if not torch.equal(inputs[0, :length], session.cache_ids[0, :length]):
+            return 0
+        return length
+    
+    def _generate(self, inputs: torch.Tensor, session: Session, **kwargs) -> torch.Tensor:
+        """
+        Run the model on a prompt, reusing and updating the session cache
+        
+        Args:
+            inputs: Prompt token ids
+            session: Conversation whose cache and settings apply
+            **kwargs: Extra arguments for model.generate (e.g. streamer)
+            
+        Returns:
+            Prompt and generated token ids
+        """
+        generation_kwargs = self._generation_kwargs(session)
+        
+        if self.engine is not None:
+            # Batched prompts are prefilled together, without the session cache
+            with metrics.GENERATE_SECONDS.time(stage="batch"):
+                reply = self.engine.generate(inputs[0].tolist(), generation_kwargs)
+            metrics.PROMPT_TOKENS.observe(inputs.shape[-1])
+            metrics.GENERATED_TOKENS.observe(len(reply))
+            reply = torch.tensor([reply], dtype=torch.long, device=inputs.device)
+            return torch.cat([inputs, reply], dim=-1)
+        
+        # Beam search does not support streamers or a draft model
+        single_beam = generation_kwargs.get("num_beams", 1) == 1
+        use_draft = single_beam and self.draft_model is not None
+        
+        # Assisted generation re-runs the whole prompt on top of a reused
+        # cache and leaves verification positions in it, so with a draft
+        # model every turn is prefilled from scratch
+        use_session = self.session_cache and config.ENABLE_CONTEXT_MEMORY and not use_draft
+        cached_length = self._cached_prefix_length(inputs, session) if use_session else 0
+        if use_session:
+            metrics.CACHE_LOOKUPS.inc(cache="kv", result="hit" if cached_length else "miss")
+        if cached_length > 0:
+            # Only the tokens past the cached prefix are run through the model
+            kwargs["past_key_values"] = session.past_key_values
+        
+        # The cache is extended in place; drop it until generation succeeds
+        session.drop_cache()
+        
+        timer = None
+        drafted = None
+        if single_beam:
+            timer = kwargs["streamer"] = _StageTimer(kwargs.get("streamer"))
+        if use_draft:
+            kwargs["assistant_model"] = self.draft_model
+            drafted = self._drafted
+        
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = self.model.generate(
+                inputs,
+                return_dict_in_generate=True,
+                **generation_kwargs,
+                **kwargs
+            )
+        end = time.perf_counter()
+        
+        if timer is not None and timer.first_token is not None:
+            metrics.GENERATE_SECONDS.observe(timer.first_token - start, stage="prefill")
+            metrics.GENERATE_SECONDS.observe(end - timer.first_token, stage="decode")
+        else:
+            metrics.GENERATE_SECONDS.observe(end - start, stage="generate")
+        metrics.PROMPT_TOKENS.observe(inputs.shape[-1] - cached_length)
+        metrics.GENERATED_TOKENS.observe(outputs.sequences.shape[-1] - inputs.shape[-1])
+        if drafted is not None:
+            # Each verification pass keeps the accepted draft tokens plus one
+            # token of the main model's own. Concurrent replies share the
+            # draft pass counter, so the split between them is approximate.
+            metrics.SPECULATIVE_TOKENS.inc(self._drafted - drafted, result="drafted")
+            metrics.SPECULATIVE_TOKENS.inc(max(timer.tokens - timer.steps, 0), result="accepted")
+        
+        if use_session:
+            session.cache_ids = outputs.sequences
+            # Older transformers versions do not return the cache; the next
+            # turn then falls back to a full prefill
+            session.past_key_values = getattr(outputs, "past_key_values", None)
+        
+        return outputs.sequences
+    
+    def _generation_kwargs(self, session: Optional[Session] = None) -> Dict:
+        """Sampling settings shared by all generation paths, with session overrides"""
+        kwargs = dict(
+            max_new_tokens=config.MAX_RESPONSE_LENGTH,
+            pad_token_id=self.tokenizer.pad_token_id,
+            eos_token_id=self.tokenizer.eos_token_id,
+            no_repeat_ngram_size=3,
+        )
+        if config.GREEDY_DECODING:
+            kwargs.update(do_sample=False)
+        else:
+            kwargs.update(do_sample=True, temperature=config.TEMPERATURE, top_p=config.TOP_P)
+        if session is not None:
+            kwargs.update(session.settings)
+        return kwargs
+    
+    def _finish_response(self, reply_ids: Sequence[int], history: TokenHistory) -> str:
+        """
+        Record the generated reply in the history and decode it
+        
+        Args:
+            reply_ids: Generated token ids, without the prompt
+            history: Conversation to add the reply to
+            
+        Returns:
+            Response text, or a fallback if nothing was generated
+        """
+        reply_ids = list(reply_ids)
+        
+        # Add response to history, closed with EOS so the next turn can follow
+        if config.ENABLE_CONTEXT_MEMORY:
+            if not reply_ids or reply_ids[-1] != self.tokenizer.eos_token_id:
+                reply_ids.append(self.tokenizer.eos_token_id)
+            history.add_reply(reply_ids)
+        
+        # Decode and clean up response
+        with metrics.GENERATE_SECONDS.time(stage="detokenize"):
+            response = self.tokenizer.decode(reply_ids, skip_special_tokens=True).strip()
+        
+        return response if response else FALLBACK_RESPONSE
+    
+    def _response_cache_key(self, user_input: str, session: Session) -> Optional[str]:
+        """
+        Response cache key for a reply, or None if it must be generated
+        
+        Sampled replies are only cached with RESPONSE_CACHE_SAMPLED, so by
+        default the cache needs GREEDY_DECODING. The key covers the decoding
+        settings and the conversation so far, so a cached reply is only reused
+        where it was given before, and the quantization, so replies of the
+        float model are not replayed for the int8 one.
+        """
+        if self.response_cache is None:
+            return None
+        
+        settings = self._generation_kwargs(session)
+        if settings.get("do_sample") and not config.RESPONSE_CACHE_SAMPLED:
+            return None
+        
+        context = session.history.token_ids().tobytes() if config.ENABLE_CONTEXT_MEMORY else b""
+        return ResponseCache.key(user_input, context, self.model_name, settings, self.quantized)
+    
+    def _lookup_response(self, user_input: str,
+                         session: Session) -> Tuple[Optional[str], Optional[List[int]]]:
+        """
+        Look a reply up in the response cache
+        
+        Returns:
+            The cache key (None if the reply must not be cached) and the
+            cached reply token ids (None on a miss)
+        """
+        key = self._response_cache_key(user_input, session)
+        if key is None:
+            return None, None
+        
+        cached = self.response_cache.get(key)
+        metrics.CACHE_LOOKUPS.inc(cache="response", result="miss" if cached is None else "hit")
+        return key, cached
+    
+    def _cache_response(self, key: Optional[str], reply_ids: Sequence[int]):
+        """Remember a generated reply (empty replies are not kept)"""
+        if key is not None and reply_ids:
+            self.response_cache.put(key, reply_ids)
+    
+    def generate_response(self, user_input: str,
+                          session: Optional[Session] = None) -> str:
         """
         Generate a response to user input
         
         Args:
             user_input: User's text input
+            session: Conversation to continue (defaults to the agent's own)
             
         Returns:
             Generated response text
         """
+        session = self.session if session is None else session
+        start = time.perf_counter()
         try:
-            # Add user input to conversation history
-            if config.ENABLE_CONTEXT_MEMORY:
-                self.conversation_history.append(user_input)
-                
-                # Limit history length (stores both user input and assistant response)
-                # Each turn = 2 messages (user + assistant), so multiply by 2
-                max_messages = config.MAX_HISTORY_LENGTH * 2
-                if len(self.conversation_history) > max_messages:
-                    self.conversation_history = self.conversation_history[-max_messages:]
-            
-            # Prepare input with conversation context
-            if config.ENABLE_CONTEXT_MEMORY and len(self.conversation_history) > 1:
-                # Include recent conversation history
-                # Use the last max_messages to get complete conversation turns
-                max_context_messages = config.MAX_HISTORY_LENGTH * 2
-                context = " ".join(self.conversation_history[-max_context_messages:])
-                input_text = context + self.tokenizer.eos_token
-            else:
-                input_text = user_input + self.tokenizer.eos_token
-            
-            # Tokenize input
-            inputs = self.tokenizer.encode(
-                input_text,
-                return_tensors="pt",
-                truncation=True,
-                max_length=1000
-            ).to(self.device)
+            key, cached = self._lookup_response(user_input, session)
+            
+            with metrics.GENERATE_SECONDS.time(stage="tokenize"):
+                inputs = self._prepare_inputs(user_input, session.history)
+            if cached is not None:
+                response = self._finish_response(cached, session.history)
+                metrics.REPLY_SECONDS.observe(time.perf_counter() - start, source="cache")
+                return response
             
             # Generate response
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    inputs,
-                    max_new_tokens=config.MAX_RESPONSE_LENGTH,
-                    temperature=config.TEMPERATURE,
-                    top_p=config.TOP_P,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.pad_token_id,
-                    eos_token_id=self.tokenizer.eos_token_id,
-                    no_repeat_ngram_size=3,
-                )
-            
-            # Decode response
-            response = self.tokenizer.decode(
-                outputs[0][inputs.shape[-1]:],
+            outputs = self._generate(inputs, session)
+            
+            reply_ids = outputs[0, inputs.shape[-1]:].tolist()
+            self._cache_response(key, reply_ids)
+            response = self._finish_response(reply_ids, session.history)
+            metrics.REPLY_SECONDS.observe(time.perf_counter() - start, source="model")
+            return response
+            
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error generating response: {e}")
+            return ERROR_RESPONSE
+    
+    def stream_response(self, user_input: str,
+                        session: Optional[Session] = None) -> Iterator[str]:
+        """
+        Generate a response to user input, yielding text as tokens are decoded
+        
+        Generation runs on a background thread so the first piece of text is
+        available after roughly one decoding step instead of the full response.
+        With batching enabled the response is yielded whole once its batch is done,
+        and a response found in the response cache is yielded whole at once.
+        Closing the iterator early stops generation at the next token.
+        
+        Args:
+            user_input: User's text input
+            session: Conversation to continue (defaults to the agent's own)
+            
+        Yields:
+            Pieces of the response text, in order
+        """
+        session = self.session if session is None else session
+        if self.engine is not None:
+            yield self.generate_response(user_input, session)
+            return
+        
+        pieces = []
+        start = time.perf_counter()
+        thread = None
+        stop = Event()
+        try:
+            key, cached = self._lookup_response(user_input, session)
+            
+            with metrics.GENERATE_SECONDS.time(stage="tokenize"):
+                inputs = self._prepare_inputs(user_input, session.history)
+            if cached is not None:
+                response = self._finish_response(cached, session.history)
+                metrics.REPLY_SECONDS.observe(time.perf_counter() - start, source="cache")
+                yield response
+                return
+            
+            streamer = TextIteratorStreamer(
+                self.tokenizer,
+                skip_prompt=True,
                 skip_special_tokens=True
             )
+            outputs = []
+            errors = []
             
-            # Clean up response
-            response = response.strip()
+            def generate():
+                try:
+                    outputs.append(self._generate(
+                        inputs, session, streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop)])
+                    ))
+                except Exception as e:
+                    # Unblock the consumer; the error is re-raised below
+                    errors.append(e)
+                    streamer.end()
             
-            # Add response to history
-            if config.ENABLE_CONTEXT_MEMORY:
-                self.conversation_history.append(response)
+            thread = Thread(target=generate, daemon=True)
+            thread.start()
             
-            return response if response else "I'm not sure how to respond to that."
+            # Strip the ends like generate_response: leading whitespace is
+            # dropped, trailing whitespace is held back until more text follows
+            held = ""
+            for piece in streamer:
+                if not pieces:
+                    piece = piece.lstrip()
+                text = held + piece
+                piece = text.rstrip()
+                held = text[len(piece):]
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+            
+            thread.join()
+            if errors:
+                raise errors[0]
             
         except Exception as e:
             if config.DEBUG:
                 print(f"{Fore.RED}Error generating response: {e}")
-            return "I apologize, I encountered an error processing your request."
+            if not pieces:
+                yield ERROR_RESPONSE
+            return
+        finally:
+            if thread is not None and thread.is_alive():
+                # The consumer stopped early; finish generation before the
+                # caller releases the session, and drop the half-built cache
+                stop.set()
+                thread.join()
+                session.drop_cache()
+        
+        reply_ids = outputs[0][0, inputs.shape[-1]:].tolist()
+        self._cache_response(key, reply_ids)
+        response = self._finish_response(reply_ids, session.history)
+        metrics.REPLY_SECONDS.observe(time.perf_counter() - start, source="model")
+        if not pieces:
+            yield response
     
-    def process_command(self, user_input: str) -> str:
+    def _handle_special_command(self, user_input: str,
+                                session: Optional[Session]) -> Optional[str]:
         """
-        Process user input and determine response
+        Handle built-in commands
         
         Args:
-            user_input: User's voice input as text
+            user_input: Stripped user input
+            session: Conversation the command applies to
             
         Returns:
-            Response text
+            Response text, or None if the input is not a special command
         """
-        user_input = user_input.strip()
-        
         # Check for special commands (case-insensitive)
         user_input_lower = user_input.lower()
         
         if any(word in user_input_lower for word in ["exit", "quit", "goodbye", "bye"]):
-            return "Goodbye! Have a great day!"
+            return GOODBYE_RESPONSE
         
         if "help" in user_input_lower:
             return self._get_help_message()
         
         if "clear" in user_input_lower or "reset" in user_input_lower:
-            self.clear_history()
-            return "I've cleared our conversation history."
+            self.clear_history(session)
+            return CLEARED_RESPONSE
+        
+        return None
+    
+    def process_command(self, user_input: str,
+                        session: Optional[Session] = None) -> str:
+        """
+        Process user input and determine response
+        
+        Args:
+            user_input: User's voice input as text
+            session: Conversation to continue (defaults to the agent's own)
+            
+        Returns:
+            Response text
+        """
+        user_input = user_input.strip()
+        
+        response = self._handle_special_command(user_input, session)
+        if response is not None:
+            return response
         
         # Generate AI response (preserve original case for better context)
-        response = self.generate_response(user_input)
+        response = self.generate_response(user_input, session)
         return response
     
-    def clear_history(self):
-        """Clear conversation history"""
-        self.conversation_history = []
+    def stream_command(self, user_input: str,
+                       session: Optional[Session] = None) -> Iterator[str]:
+        """
+        Process user input, yielding the response as it is generated
+        
+        Args:
+            user_input: User's voice input as text
+            session: Conversation to continue (defaults to the agent's own)
+            
+        Yields:
+            Pieces of the response text, in order
+        """
+        user_input = user_input.strip()
+        
+        response = self._handle_special_command(user_input, session)
+        if response is not None:
+            yield response
+            return
+        
+        yield from self.stream_response(user_input, session)
+    
+    def clear_history(self, session: Optional[Session] = None):
+        """
+        Clear conversation history
+        
+        Args:
+            session: Conversation to clear (defaults to the agent's own)
+        """
+        session = self.session if session is None else session
+        session.clear()
         if config.VERBOSE:
             print(f"{Fore.YELLOW}Conversation history cleared")
     
+    def fixed_responses(self) -> List[str]:
+        """Replies that do not come from the model"""
+        return [
+            GOODBYE_RESPONSE,
+            CLEARED_RESPONSE,
+            self._get_help_message(),
+            FALLBACK_RESPONSE,
+            ERROR_RESPONSE,
+        ]
+    
     def _get_help_message(self) -> str:
         """Return help message"""
         return (
@@ -0,0 +1,205 @@
+"""
+Audio Capture Module
+Keeps the microphone open and records into a ring buffer on a background thread
+"""
+
+from threading import Condition, Event, Thread
+from typing import Optional
+import config
+from colorama import Fore, init
+
+init(autoreset=True)
+
+
+class AudioRingBuffer:
+    """
+    Fixed-size circular buffer of PCM, written by one thread and read by many
+
+    Positions are absolute byte offsets into the stream, so each reader
+    keeps its own cursor. Reads return memoryview slices of the buffer
+    itself. A slice stays valid until the writer wraps around to it, one
+    full buffer later; copy anything that must be kept longer.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Buffer size in bytes
+        """
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._written = 0
+        self._closed = False
+        self._condition = Condition()
+
+    @property
+    def position(self) -> int:
+        """Stream position just after the newest byte"""
+        return self._written
+
+    @property
+    def closed(self) -> bool:
+        """Whether the writer has stopped"""
+        return self._closed
+
+    def write(self, data: bytes):
+        """Append audio, overwriting the oldest data once the buffer is full"""
+        data = memoryview(data)
+        start = self._written % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        self._view[:len(data) - first] = data[first:]
+
+        with self._condition:
+            self._written += len(data)
+            self._condition.notify_all()
+
+    def read(self, position: int, max_bytes: Optional[int] = None,
+             timeout: Optional[float] = None):
+        """
+        Read audio from a stream position without copying
+
+        Args:
+            position: Where to start reading; positions older than the
+                buffer holds skip ahead to the oldest audio still there
+            max_bytes: Upper bound on the returned length
+            timeout: Seconds to wait for new audio (None waits forever)
+
+        Returns:
+            A memoryview of contiguous audio (empty on timeout or close)
+            and the position after it
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._written > position or self._closed, timeout)
+            written = self._written
+
+        position = max(position, written - self.capacity)
+        if position >= written:
+            return self._view[:0], position
+
+        start = position % self.capacity
+        length = min(written - position, self.capacity - start)
+        if max_bytes is not None:
+            length = min(length, max_bytes)
+        return self._view[start:start + length], position + length
+
+    def close(self):
+        """Wake up waiting readers after the writer stops"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class AudioReader:
+    """A consumer's cursor into an AudioRingBuffer"""
+
+    def __init__(self, ring: AudioRingBuffer, position: Optional[int] = None):
+        """
+        Args:
+            ring: Buffer to read from
+            position: Starting position (defaults to the newest audio)
+        """
+        self.ring = ring
+        self.position = ring.position if position is None else position
+
+    def read(self, max_bytes: Optional[int] = None, timeout: Optional[float] = None) -> memoryview:
+        """
+        Read the next audio without copying
+
+        Returns:
+            A memoryview of the buffer, empty on timeout
+        """
+        view, self.position = self.ring.read(self.position, max_bytes, timeout)
+        return view
+
+    def read_exact(self, size: int, timeout: Optional[float] = None) -> bytes:
+        """
+        Read exactly size bytes (fewer only if the writer stops)
+
+        Returns:
+            A copy of the audio
+        """
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            view = self.read(remaining, timeout)
+            if not len(view):
+                if self.ring.closed:
+                    break
+                continue
+            chunks.append(bytes(view))
+            remaining -= len(view)
+        return b"".join(chunks)
+
+    def lag(self) -> int:
+        """Bytes written since this reader's position"""
+        return self.ring.position - self.position
+
+    def skip_to(self, position: int):
+        """Move the cursor, e.g. to drop audio nobody needs"""
+        self.position = position
+
+
+class AudioCapture:
+    """
+    Records from an open microphone into a ring buffer on a background thread
+
+    The microphone is opened once and stays open, so there is no gap (and no
+    device setup) between one listen and the next.
+    """
+
+    def __init__(self, microphone, seconds: float = config.CAPTURE_BUFFER_SECONDS):
+        """
+        Args:
+            microphone: speech_recognition Microphone (opened here)
+            seconds: Audio history kept in the ring buffer
+        """
+        self.microphone = microphone
+        self.source = microphone.__enter__()
+        self.sample_rate = self.source.SAMPLE_RATE
+        self.sample_width = self.source.SAMPLE_WIDTH
+        self.chunk = self.source.CHUNK
+
+        # A whole number of chunks, so writes never straddle a sample
+        chunk_bytes = self.chunk * self.sample_width
+        chunks = max(2, int(seconds * self.sample_rate / self.chunk))
+        self.ring = AudioRingBuffer(chunks * chunk_bytes)
+
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self) -> bool:
+        """Whether recording has stopped"""
+        return self.ring.closed
+
+    def bytes_for(self, milliseconds: float) -> int:
+        """Number of bytes holding the given duration of audio"""
+        return int(self.sample_rate * milliseconds / 1000) * self.sample_width
+
+    def reader(self, position: Optional[int] = None) -> AudioReader:
+        """New cursor into the recording (at the newest audio by default)"""
+        return AudioReader(self.ring, position)
+
+    def _run(self):
+        """Copy microphone chunks into the ring buffer until closed"""
+        try:
+            while not self._stopped.is_set():
+                self.ring.write(self.source.stream.read(self.chunk))
+        except Exception as e:
+            if not self._stopped.is_set():
+                print(f"{Fore.RED}Audio capture stopped: {e}")
+        finally:
+            self.ring.close()
+
+    def close(self):
+        """Stop recording and release the microphone"""
+        self._stopped.set()
+        self._thread.join(timeout=1)
+        try:
+            self.microphone.__exit__(None, None, None)
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error closing microphone: {e}")
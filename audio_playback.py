@@ -0,0 +1,137 @@
+"""
+Audio Playback Module
+Decodes synthesized speech in memory and plays it on a persistent output stream
+"""
+
+import io
+import wave
+from typing import Callable, NamedTuple, Optional
+import config
+from colorama import Fore, init
+
+init(autoreset=True)
+
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
+    pyaudio = None
+
+try:
+    import miniaudio
+    MINIAUDIO_AVAILABLE = True
+except ImportError:
+    MINIAUDIO_AVAILABLE = False
+    miniaudio = None
+
+
+class Clip(NamedTuple):
+    """Decoded audio ready to play"""
+    pcm: bytes
+    sample_rate: int
+    channels: int
+    sample_width: int
+
+
+def decode_audio(data: bytes, audio_format: str) -> Clip:
+    """
+    Decode an encoded sound file held in memory
+
+    WAV is read with the standard library and MP3 with miniaudio, both in
+    process. Without miniaudio, pydub is used, which runs ffmpeg.
+
+    Args:
+        data: Encoded audio
+        audio_format: "wav" or "mp3"
+
+    Returns:
+        The decoded audio
+    """
+    if audio_format == "wav":
+        try:
+            with wave.open(io.BytesIO(data)) as reader:
+                return Clip(reader.readframes(reader.getnframes()), reader.getframerate(),
+                            reader.getnchannels(), reader.getsampwidth())
+        except wave.Error:
+            pass  # e.g. AIFF from pyttsx3 on macOS; let pydub identify it
+
+    elif audio_format == "mp3" and MINIAUDIO_AVAILABLE:
+        decoded = miniaudio.decode(data, output_format=miniaudio.SampleFormat.SIGNED16)
+        return Clip(decoded.samples.tobytes(), decoded.sample_rate, decoded.nchannels, 2)
+
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(io.BytesIO(data))
+    return Clip(segment.raw_data, segment.frame_rate, segment.channels, segment.sample_width)
+
+
+class AudioPlayer:
+    """
+    Plays clips on an output stream that stays open between clips
+
+    Clips are written in short blocks, so playback can be stopped between
+    blocks. Without PyAudio, clips are played with pydub instead and cannot
+    be interrupted.
+    """
+
+    BLOCK_MS = 50  # Granularity of stopping
+
+    def __init__(self):
+        self._pyaudio = pyaudio.PyAudio() if PYAUDIO_AVAILABLE else None
+        self._stream = None
+        self._stream_format = None
+
+    def play(self, clip: Clip, should_stop: Optional[Callable[[], bool]] = None):
+        """
+        Play a clip, blocking until it ends or should_stop returns True
+
+        Args:
+            clip: Audio to play
+            should_stop: Checked between blocks to cut playback short
+        """
+        if self._pyaudio is None:
+            self._play_pydub(clip)
+            return
+
+        stream = self._open(clip)
+        block = max(1, clip.sample_rate * self.BLOCK_MS // 1000) * clip.channels * clip.sample_width
+        view = memoryview(clip.pcm)
+        for start in range(0, len(view), block):
+            if should_stop is not None and should_stop():
+                return
+            stream.write(bytes(view[start:start + block]))
+
+    def _open(self, clip: Clip):
+        """Output stream for the clip's format, reopened only when the format changes"""
+        stream_format = (clip.sample_rate, clip.channels, clip.sample_width)
+        if self._stream is None or stream_format != self._stream_format:
+            self.close()
+            self._stream = self._pyaudio.open(
+                format=self._pyaudio.get_format_from_width(clip.sample_width),
+                channels=clip.channels,
+                rate=clip.sample_rate,
+                output=True,
+            )
+            self._stream_format = stream_format
+        return self._stream
+
+    @staticmethod
+    def _play_pydub(clip: Clip):
+        """Fallback playback through pydub"""
+        from pydub import AudioSegment
+        from pydub.playback import play
+
+        play(AudioSegment(clip.pcm, sample_width=clip.sample_width,
+                          frame_rate=clip.sample_rate, channels=clip.channels))
+
+    def close(self):
+        """Close the output stream"""
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+            except Exception as e:
+                if config.DEBUG:
+                    print(f"{Fore.RED}Error closing audio stream: {e}")
+            self._stream = None
+            self._stream_format = None
@@ -0,0 +1,175 @@
+"""
+Batched Inference Module
+Runs prompts from many conversations through one model in padded batches
+"""
+
+import queue
+import time
+import torch
+from concurrent.futures import Future
+from threading import Thread
+from typing import Dict, List, Sequence
+import config
+import metrics
+from colorama import Fore, init
+
+init(autoreset=True)
+
+
+class _Request:
+    """A prompt waiting to be generated"""
+
+    __slots__ = ("input_ids", "generation_kwargs", "key", "future")
+
+    def __init__(self, input_ids: Sequence[int], generation_kwargs: Dict):
+        self.input_ids = list(input_ids)
+        self.generation_kwargs = generation_kwargs
+        # Only requests with identical sampling settings can share a batch
+        self.key = tuple(sorted(generation_kwargs.items()))
+        self.future = Future()
+
+
+class BatchingEngine:
+    """
+    Collects pending prompts from many callers and generates them together
+
+    Callers block on submit(...).result() (or generate) while a single worker
+    thread groups requests with the same sampling settings, left-pads them
+    into one batch and runs model.generate once per batch.
+    """
+
+    def __init__(self, model, tokenizer,
+                 max_batch_size: int = config.BATCH_MAX_SIZE,
+                 max_wait_ms: float = config.BATCH_MAX_WAIT_MS):
+        """
+        Args:
+            model: Loaded causal language model
+            tokenizer: Tokenizer matching the model (must have a pad token)
+            max_batch_size: Maximum number of prompts per batch
+            max_wait_ms: How long to wait for more prompts before running a batch
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        metrics.QUEUE_DEPTH.set_function(self._queue.qsize, queue="batch")
+        self._pending: List[_Request] = []
+        self._closed = False
+        self._thread = Thread(target=self._run, name="batching-engine", daemon=True)
+        self._thread.start()
+
+    def submit(self, input_ids: Sequence[int], generation_kwargs: Dict) -> Future:
+        """
+        Queue a prompt for generation
+
+        Args:
+            input_ids: Prompt token ids
+            generation_kwargs: Arguments for model.generate
+
+        Returns:
+            Future resolving to the generated token ids (without the prompt,
+            ending at the first EOS)
+        """
+        if self._closed:
+            raise RuntimeError("Batching engine is closed")
+
+        request = _Request(input_ids, generation_kwargs)
+        self._queue.put(request)
+        return request.future
+
+    def generate(self, input_ids: Sequence[int], generation_kwargs: Dict) -> List[int]:
+        """Queue a prompt and wait for its generated token ids"""
+        return self.submit(input_ids, generation_kwargs).result()
+
+    def close(self):
+        """Finish queued work and stop the worker thread"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        """Worker loop: gather a batch, run it, repeat"""
+        stopping = False
+        while not (stopping and not self._pending):
+            if not self._pending:
+                request = self._queue.get()
+                if request is None:
+                    break
+                self._pending.append(request)
+
+            # Give other callers a short window to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while not stopping and self._count_batchable() < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                else:
+                    self._pending.append(request)
+
+            self._run_batch(self._take_batch())
+
+    def _count_batchable(self) -> int:
+        """Number of pending requests that can join the oldest one's batch"""
+        key = self._pending[0].key
+        return sum(1 for request in self._pending if request.key == key)
+
+    def _take_batch(self) -> List[_Request]:
+        """Remove and return the oldest request plus compatible ones"""
+        key = self._pending[0].key
+        batch, rest = [], []
+        for request in self._pending:
+            if request.key == key and len(batch) < self.max_batch_size:
+                batch.append(request)
+            else:
+                rest.append(request)
+        self._pending = rest
+        return batch
+
+    def _run_batch(self, batch: List[_Request]):
+        """Generate one padded batch and hand each row back to its caller"""
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            pad_id = self.tokenizer.pad_token_id
+            eos_id = self.tokenizer.eos_token_id
+            width = max(len(request.input_ids) for request in batch)
+
+            # Left-pad so every row's generated tokens start at the same column
+            input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+            for row, request in enumerate(batch):
+                length = len(request.input_ids)
+                input_ids[row, width - length:] = torch.tensor(request.input_ids)
+                attention_mask[row, width - length:] = 1
+
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    input_ids.to(self.model.device),
+                    attention_mask=attention_mask.to(self.model.device),
+                    **batch[0].generation_kwargs
+                )
+
+            for row, request in enumerate(batch):
+                reply = outputs[row, width:].tolist()
+                # Rows that finished early are padded out to the longest reply
+                if eos_id in reply:
+                    reply = reply[:reply.index(eos_id) + 1]
+                request.future.set_result(reply)
+
+            if config.VERBOSE:
+                print(f"{Fore.YELLOW}Generated batch of {len(batch)}")
+
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
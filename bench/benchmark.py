@@ -0,0 +1,256 @@
+"""
+Agent Benchmark
+Measures the AIAgent hot path on a tiny local model and compares it to a baseline
+
+Usage:
+    python bench/benchmark.py                    # Run and compare to bench/baseline.json
+    python bench/benchmark.py --update-baseline  # Run and store the result as the baseline
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+import transformers
+from colorama import Fore, Style, init
+
+import config
+from tiny_model import build_tiny_model
+
+init(autoreset=True)
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_OUTPUT = BENCH_DIR / "results.json"
+
+# Metrics where a larger value is better; for all others smaller is better
+HIGHER_IS_BETTER = {"tokens_per_s"}
+
+PROMPTS = [
+    "Hello! How are you doing today?",
+    "What can you help me with?",
+    "Tell me something interesting about the weather.",
+    "What time is it?",
+    "Where are we going next?",
+    "Sure, tell me a fun fact about the ocean.",
+]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure_load(model_path: Path):
+    """
+    Load the agent the way the assistant does, minus the optional caches
+
+    Returns:
+        The agent and the load time in seconds
+    """
+    from ai_agent import AIAgent
+
+    start = time.perf_counter()
+    agent = AIAgent(model_name=str(model_path), use_snapshot=False,
+                    response_cache=False, batching=False, quantize=False)
+    return agent, time.perf_counter() - start
+
+
+def measure_stream(agent, settings: Dict, new_tokens: int, repeats: int) -> Dict[str, float]:
+    """
+    Time to first streamed text and decoding speed of a reply with no history
+
+    Returns:
+        Median first-piece latency in ms and decoded tokens per second
+    """
+    from sessions import Session
+
+    first_ms, rates = [], []
+    for i in range(repeats):
+        session = Session(f"stream-{i}", settings=settings)
+        start = time.perf_counter()
+        first = None
+        for _ in agent.stream_response(PROMPTS[0], session):
+            if first is None:
+                first = time.perf_counter()
+        end = time.perf_counter()
+
+        first_ms.append((first - start) * 1000)
+        # The first token is covered by the first-piece latency
+        rates.append((new_tokens - 1) / max(end - first, 1e-9))
+
+    return {
+        "first_token_ms": statistics.median(first_ms),
+        "tokens_per_s": statistics.median(rates),
+    }
+
+
+def measure_turns(agent, settings: Dict, turns: int, repeats: int) -> List[float]:
+    """
+    Latency of each turn of a conversation as its history grows
+
+    Turn i is generated with i earlier turns in the history.
+
+    Returns:
+        Median latency in ms of each turn
+    """
+    from sessions import Session
+
+    samples = [[] for _ in range(turns)]
+    for i in range(repeats):
+        session = Session(f"turns-{i}", settings=settings)
+        for turn in range(turns):
+            start = time.perf_counter()
+            agent.generate_response(PROMPTS[turn % len(PROMPTS)], session)
+            samples[turn].append((time.perf_counter() - start) * 1000)
+    return [statistics.median(turn) for turn in samples]
+
+
+def run(args) -> Dict:
+    """Run every measurement and collect the results"""
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    # Fixed-length greedy replies, so every run does the same work
+    settings = {"do_sample": False, "max_new_tokens": args.new_tokens,
+                "min_new_tokens": args.new_tokens}
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = build_tiny_model(Path(directory) / "tiny-model", layers=args.layers,
+                                      hidden=args.hidden, heads=args.heads)
+        agent, load_s = measure_load(model_path)
+
+        # One untimed reply pays the one-time costs, as ENABLE_WARMUP does
+        agent.warmup()
+
+        metrics = {"load_s": load_s}
+        metrics.update(measure_stream(agent, settings, args.new_tokens, args.repeats))
+        turn_ms = measure_turns(agent, settings, config.MAX_HISTORY_LENGTH + 1, args.repeats)
+        for turn, latency in enumerate(turn_ms):
+            metrics[f"turn_{turn}_ms"] = latency
+
+    metrics["peak_rss_mb"] = peak_rss_mb()
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+            "platform": platform.platform(),
+            "threads": torch.get_num_threads(),
+        },
+        "parameters": {
+            "layers": args.layers,
+            "hidden": args.hidden,
+            "heads": args.heads,
+            "new_tokens": args.new_tokens,
+            "repeats": args.repeats,
+            "history_turns": config.MAX_HISTORY_LENGTH,
+            "kv_cache": config.ENABLE_KV_CACHE,
+        },
+        "metrics": metrics,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Print each metric next to its baseline value
+
+    Args:
+        results: Results of this run
+        baseline: Stored results to compare against
+        tolerance: Relative slowdown allowed before a metric counts as a regression
+
+    Returns:
+        Names of the metrics that regressed
+    """
+    if baseline.get("parameters") != results["parameters"]:
+        print(f"{Fore.YELLOW}Baseline was recorded with different parameters; "
+              f"comparison is indicative only")
+
+    regressions = []
+    print(f"\n{Style.BRIGHT}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, value in results["metrics"].items():
+        reference = baseline.get("metrics", {}).get(name)
+        if value is None or not reference:
+            print(f"{name:<16}{'-':>12}{_format(value):>12}")
+            continue
+
+        change = value / reference - 1
+        worse = -change if name in HIGHER_IS_BETTER else change
+        color = Fore.RED if worse > tolerance else Fore.GREEN if worse < -tolerance else ""
+        print(f"{color}{name:<16}{_format(reference):>12}{_format(value):>12}{change:>+10.1%}")
+        if worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def _format(value) -> str:
+    return "-" if value is None else f"{value:.3f}" if value < 10 else f"{value:.1f}"
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the AIAgent hot path on a tiny local model")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT,
+                        help=f"Where to write the results (default: {DEFAULT_OUTPUT.name})")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE,
+                        help=f"Results to compare against (default: {DEFAULT_BASELINE.name})")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown reported as a regression (default: 0.10)")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="Runs per measurement; the median is reported (default: 5)")
+    parser.add_argument("--new-tokens", type=int, default=32,
+                        help="Tokens generated per reply (default: 32)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Torch intra-op threads (default: torch's choice)")
+    parser.add_argument("--layers", type=int, default=2, help="Tiny model layers (default: 2)")
+    parser.add_argument("--hidden", type=int, default=64, help="Tiny model width (default: 64)")
+    parser.add_argument("--heads", type=int, default=2, help="Tiny model attention heads (default: 2)")
+    args = parser.parse_args()
+
+    print(f"{Fore.CYAN}{Style.BRIGHT}=== Agent Benchmark ==={Style.RESET_ALL}")
+    results = run(args)
+
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"{Fore.GREEN}Results written to {args.output}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"{Fore.GREEN}Baseline updated: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"{Fore.YELLOW}No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if regressions:
+        print(f"\n{Fore.RED}Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\n{Fore.GREEN}No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Tiny Model Builder
+Creates a small randomly initialized DialoGPT-style model for offline benchmarks
+"""
+
+from pathlib import Path
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+EOS_TOKEN = "<|endoftext|>"
+
+# Fixed training text, so the tokenizer (and with it every run) is identical
+_CORPUS = [
+    "Hello! How are you doing today?",
+    "What can you help me with?",
+    "Tell me something interesting about the weather.",
+    "Sure, here is a fun fact about the ocean.",
+    "What time is it and where are we going next?",
+    "I'm your voice-activated AI assistant. Say goodbye to exit.",
+] * 20
+
+
+def build_tiny_model(directory: Path, layers: int = 2, hidden: int = 64, heads: int = 2,
+                     vocab_size: int = 512, positions: int = 1024, seed: int = 0) -> Path:
+    """
+    Save a GPT-2 architecture model (like DialoGPT) with a byte-level BPE tokenizer
+
+    The weights are random but seeded, so generations are reproducible.
+    Nothing is downloaded.
+
+    Args:
+        directory: Where to save the model and tokenizer
+        layers: Transformer blocks
+        hidden: Embedding size
+        heads: Attention heads
+        vocab_size: Tokenizer vocabulary size
+        positions: Context window in tokens
+        seed: Seed for the weights
+
+    Returns:
+        The model directory, loadable with from_pretrained
+    """
+    directory = Path(directory)
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(_CORPUS, trainers.BpeTrainer(
+        vocab_size=vocab_size,
+        special_tokens=[EOS_TOKEN],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    ))
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        eos_token=EOS_TOKEN, bos_token=EOS_TOKEN, unk_token=EOS_TOKEN,
+    )
+
+    torch.manual_seed(seed)
+    model = GPT2LMHeadModel(GPT2Config(
+        n_layer=layers,
+        n_embd=hidden,
+        n_head=heads,
+        vocab_size=len(tokenizer),
+        n_positions=positions,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    ))
+
+    model.save_pretrained(directory)
+    tokenizer.save_pretrained(directory)
+    return directory
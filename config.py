@@ -10,9 +10,12 @@ BASE_DIR = Path(__file__).parent
 MODELS_DIR = BASE_DIR / "models"
 CACHE_DIR = BASE_DIR / "cache"
 
-# Ensure directories exist
-MODELS_DIR.mkdir(exist_ok=True)
-CACHE_DIR.mkdir(exist_ok=True)
+
+def ensure_directories():
+    """Create the model and cache directories if they do not exist"""
+    MODELS_DIR.mkdir(exist_ok=True)
+    CACHE_DIR.mkdir(exist_ok=True)
+
 
 # Hugging Face Model Configuration
 MODEL_NAME = "microsoft/DialoGPT-medium"  # Conversational model
@@ -23,27 +26,100 @@ ALTERNATIVE_MODELS = {
 }
 
 # Speech Recognition Settings
+RECOGNIZER_BACKEND = "google"  # Options: "google" (online), "vosk" (offline, streaming)
+VOSK_MODEL_PATH = MODELS_DIR / "vosk-model-small-en-us-0.15"  # Unpacked Vosk model
 SPEECH_RECOGNITION_LANGUAGE = "en-US"
 WAKE_WORD = "hey assistant"  # Wake word to activate the agent
+ENABLE_WAKE_WORD_SPOTTER = True  # Spot the wake word locally (needs vosk) instead of transcribing every phrase
 ENERGY_THRESHOLD = 4000  # Microphone sensitivity (adjust based on environment)
 PAUSE_THRESHOLD = 1.0  # Seconds of silence before considering phrase complete
 
+# Voice Activity Detection Settings
+ENABLE_VAD = True  # Endpoint speech locally instead of waiting PAUSE_THRESHOLD
+VAD_FRAME_MS = 20  # Analysis frame length
+VAD_THRESHOLD_DB = 9.0  # How far above the noise floor speech must be
+VAD_ZCR_THRESHOLD = 0.3  # Zero-crossing rate that marks quieter frames as speech
+VAD_START_MS = 60  # Speech needed before a phrase starts
+VAD_END_MS = 300  # Silence needed before a phrase ends
+VAD_PADDING_MS = 150  # Audio kept before and after each phrase
+VAD_MAX_SEGMENT_MS = 15000  # Longest phrase
+
+# Audio Capture Settings
+CAPTURE_BUFFER_SECONDS = 30  # Recent microphone audio kept in memory
+CAPTURE_MAX_LAG_MS = 500  # Older unread audio is skipped when listening starts
+WAKE_WORD_REWIND_MS = 300  # Audio re-read after the wake word so a command in the same breath is kept
+
 # Text-to-Speech Settings
 TTS_ENGINE = "pyttsx3"  # Options: "pyttsx3" (offline), "gtts" (online)
 TTS_RATE = 175  # Speaking rate (words per minute)
 TTS_VOLUME = 0.9  # Volume level (0.0 to 1.0)
+TTS_MIN_CLAUSE_CHARS = 40  # Split long sentences at commas once this many characters are queued
+TTS_PREFETCH_CHUNKS = 2  # Chunks synthesized ahead of the one playing
+
+# Speech Cache Settings
+ENABLE_SPEECH_CACHE = True  # Reuse synthesized audio for repeated phrases
+SPEECH_CACHE_SIZE = 64  # Phrases kept decoded in memory
+SPEECH_CACHE_FILES = 500  # Phrases kept on disk under CACHE_DIR/speech
+
+# Response Cache Settings
+ENABLE_RESPONSE_CACHE = True  # Answer repeated prompts (same words, context and settings) from memory;
+                              # only deterministic replies are cached, so it needs GREEDY_DECODING
+RESPONSE_CACHE_SIZE = 256  # Replies kept
+RESPONSE_CACHE_TTL = 3600  # Seconds before a cached reply is generated afresh (0 for no limit)
+RESPONSE_CACHE_SAMPLED = False  # Also cache sampled (do_sample) replies, which then repeat
+RESPONSE_CACHE_PERSIST = False  # Save cached replies to CACHE_DIR/responses.json across restarts
 
 # AI Agent Settings
 MAX_HISTORY_LENGTH = 5  # Number of conversation turns to remember
 MAX_RESPONSE_LENGTH = 150  # Maximum tokens in response
 TEMPERATURE = 0.8  # Creativity level (0.0 to 1.0)
 TOP_P = 0.9  # Nucleus sampling parameter
+GREEDY_DECODING = False  # Always pick the likeliest token (ignores TEMPERATURE and TOP_P); replies repeat
+MAX_INPUT_LENGTH = 1000  # Maximum prompt tokens (history + new input)
+QUANTIZE_INT8 = False  # Dynamic int8 quantization of linear layers (CPU only, less memory)
+ENABLE_MODEL_SNAPSHOT = True  # Keep a ready-to-run safetensors copy in MODELS_DIR for fast starts
+ENABLE_WARMUP = True  # Run a tiny generation at startup so the first reply is not slowed down
+ENABLE_SPECULATIVE_DECODING = False  # Draft tokens with DRAFT_MODEL, verified by the main model
+DRAFT_MODEL = ALTERNATIVE_MODELS["small"]  # Must share the main model's tokenizer
+DRAFT_TOKENS = 5  # Tokens drafted per verification pass at the start (adapts as it runs)
 
 # Features
 ENABLE_WAKE_WORD = True  # Require wake word to activate
 ENABLE_VOICE_FEEDBACK = True  # Audio confirmation when listening
 ENABLE_CONTEXT_MEMORY = True  # Remember conversation context
 ENABLE_PROGRAMMING_MODE = False  # Future feature for programming assistance
+ENABLE_KV_CACHE = True  # Reuse the model's attention cache across turns (needs context memory)
+ENABLE_BATCHING = False  # Batch generation across concurrent conversations
+
+# Batching Settings
+BATCH_MAX_SIZE = 8  # Maximum prompts generated together
+BATCH_MAX_WAIT_MS = 20  # How long to wait for more prompts before generating
+
+# Session Settings
+MAX_SESSIONS = 100  # Maximum concurrent conversations sharing one model
+SESSION_TTL_SECONDS = 1800  # Idle time before a conversation is forgotten
+SESSION_MEMORY_LIMIT_MB = 1024  # Memory cap for histories and attention caches
+
+# Server Settings (python main.py --serve)
+SERVER_HOST = "127.0.0.1"  # Interface to listen on (local clients only by default)
+SERVER_PORT = 8765  # HTTP and WebSocket port
+SERVER_MAX_CONCURRENCY = 1  # Replies generated at once (raise with ENABLE_BATCHING)
+SERVER_MAX_QUEUE = 16  # Requests allowed to wait for a slot before new ones are refused
+SERVER_QUEUE_TIMEOUT = 30  # Seconds a request may wait for a slot
+
+# Worker Pool Settings (python main.py --serve --workers N)
+WORKER_PROCESSES = 1  # Agent processes serving requests (1 = serve from this process)
+WORKER_THREADS = 0  # Torch threads per worker (0 = one per core assigned to it)
+WORKER_PIN_CORES = True  # Pin each worker to its own cores (Linux only)
+
+# Metrics Settings
+METRICS_PORT = 0  # Serve Prometheus metrics at /metrics in voice/text mode (0 = off; --serve has its own)
+
+# Voice Pipeline Settings
+PIPELINE_QUEUE_SIZE = 2  # Pending items between listen/recognize/think/speak stages
+ENABLE_BARGE_IN = False  # Speaking over the assistant interrupts it (best with headphones,
+                         # otherwise the microphone may pick up the assistant's own voice)
+PLAYBACK_ECHO_MS = 250  # Without barge-in, speech starting this soon after a reply is its echo
 
 # Debug Settings
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
@@ -0,0 +1,155 @@
+"""
+Conversation History Module
+Stores conversation turns as token ids so prompts never need re-tokenizing
+"""
+
+from array import array
+from collections import deque
+from typing import Iterator, Sequence
+
+
+class TokenHistory:
+    """
+    Token ids of recent conversation turns in one contiguous buffer
+
+    Messages are stored already encoded, including their EOS separator, so
+    the prompt for the next turn is simply the buffer contents. A turn is a
+    user message plus the replies that follow it; eviction always removes
+    whole turns from the front so the newest messages are never lost.
+    """
+
+    def __init__(self, max_turns: int):
+        """
+        Args:
+            max_turns: Maximum number of turns to keep
+        """
+        self.max_turns = max_turns
+
+        # Live ids are self._ids[self._start:]; evicted ids are compacted lazily
+        self._ids = array("i")
+        self._start = 0
+        self._message_lengths = deque()
+        self._turn_sizes = deque()  # Number of messages in each turn
+
+    def __len__(self) -> int:
+        """Number of stored messages"""
+        return len(self._message_lengths)
+
+    @property
+    def num_tokens(self) -> int:
+        """Number of stored token ids"""
+        return len(self._ids) - self._start
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the stored token ids"""
+        return self.num_tokens * self._ids.itemsize
+
+    @property
+    def num_turns(self) -> int:
+        """Number of stored turns"""
+        return len(self._turn_sizes)
+
+    def add_user_message(self, token_ids: Sequence[int]) -> int:
+        """
+        Start a new turn with a user message
+
+        Args:
+            token_ids: Encoded message, including its EOS separator
+
+        Returns:
+            Number of turns evicted to stay within max_turns
+        """
+        self._append(token_ids)
+        self._turn_sizes.append(1)
+
+        evicted = 0
+        while self.num_turns > self.max_turns:
+            self._evict_turn()
+            evicted += 1
+        return evicted
+
+    def add_reply(self, token_ids: Sequence[int]):
+        """
+        Add a reply to the current turn
+
+        Args:
+            token_ids: Encoded reply, including its EOS separator
+        """
+        self._append(token_ids)
+        if self._turn_sizes:
+            self._turn_sizes[-1] += 1
+        else:
+            self._turn_sizes.append(1)
+
+    def fit(self, max_tokens: int) -> int:
+        """
+        Evict whole turns from the front until the history fits a token budget
+
+        If the newest turn alone is over budget, its oldest tokens are dropped
+        instead, so the end of the latest message is always kept.
+
+        Args:
+            max_tokens: Token budget
+
+        Returns:
+            Number of turns evicted
+        """
+        evicted = 0
+        while self.num_tokens > max_tokens and self.num_turns > 1:
+            self._evict_turn()
+            evicted += 1
+
+        excess = self.num_tokens - max_tokens
+        while excess > 0:
+            # Trim the oldest message, dropping it entirely if needed
+            first = self._message_lengths[0]
+            if first <= excess and len(self._message_lengths) > 1:
+                self._drop_messages(1)
+                self._turn_sizes[0] -= 1
+            else:
+                self._start += excess
+                self._message_lengths[0] -= excess
+            excess = self.num_tokens - max_tokens
+
+        self._compact()
+        return evicted
+
+    def token_ids(self) -> array:
+        """Return a copy of all stored token ids, oldest first"""
+        return self._ids[self._start:]
+
+    def messages(self) -> Iterator[array]:
+        """Yield the token ids of each stored message, oldest first"""
+        offset = self._start
+        for length in self._message_lengths:
+            yield self._ids[offset:offset + length]
+            offset += length
+
+    def clear(self):
+        """Remove all turns"""
+        self._ids = array("i")
+        self._start = 0
+        self._message_lengths.clear()
+        self._turn_sizes.clear()
+
+    def _append(self, token_ids: Sequence[int]):
+        """Append one message to the buffer"""
+        self._ids.extend(token_ids)
+        self._message_lengths.append(len(token_ids))
+
+    def _evict_turn(self):
+        """Remove the oldest turn"""
+        self._drop_messages(self._turn_sizes.popleft())
+        self._compact()
+
+    def _drop_messages(self, count: int):
+        """Advance the start of the buffer past the oldest messages"""
+        for _ in range(count):
+            self._start += self._message_lengths.popleft()
+
+    def _compact(self):
+        """Reclaim evicted space once it outweighs the live ids"""
+        if self._start > self.num_tokens:
+            del self._ids[:self._start]
+            self._start = 0
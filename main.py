@@ -7,50 +7,127 @@ such as while driving or when you can't be at the computer.
 """
 
 import sys
+import time
+import asyncio
 import argparse
+from typing import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from colorama import Fore, Style, init
 
 import config
-from voice_input import VoiceInput
-from voice_output import VoiceOutput
-from ai_agent import AIAgent
 
 init(autoreset=True)
 
+WELCOME_MESSAGE = "Hello! I'm your AI assistant. How can I help you today?"
+
 
 class VoiceAIAssistant:
     """Main application class for the voice AI assistant"""
     
-    def __init__(self, model_name: str = None, no_voice: bool = False):
+    def __init__(self, model_name: str = None, no_voice: bool = False,
+                 quantize: bool = config.QUANTIZE_INT8,
+                 speculative: bool = config.ENABLE_SPECULATIVE_DECODING):
         """
         Initialize the voice AI assistant
         
         Args:
             model_name: Optional custom model name to use
             no_voice: If True, disable voice input/output for text-only mode
+            quantize: If True, load the model with int8 quantization (CPU)
+            speculative: If True, draft tokens with config.DRAFT_MODEL
         """
         print(f"{Fore.CYAN}{Style.BRIGHT}=== Voice-Activated AI Assistant ==={Style.RESET_ALL}")
         print(f"{Fore.CYAN}Initializing components...\n")
         
         self.no_voice = no_voice
-        
-        # Initialize AI Agent
+        start = time.perf_counter()
         model = model_name if model_name else config.MODEL_NAME
-        self.agent = AIAgent(model_name=model)
         
-        if not no_voice:
-            # Initialize Voice components
-            try:
-                self.voice_input = VoiceInput()
-                self.voice_output = VoiceOutput()
-            except Exception as e:
-                print(f"{Fore.RED}Error initializing voice components: {e}")
-                print(f"{Fore.YELLOW}Falling back to text-only mode")
-                self.no_voice = True
+        # Model loading (plus warm-up), microphone calibration and TTS setup
+        # are independent, so they run concurrently
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            agent_future = pool.submit(self._load_agent, model, quantize, speculative)
+            
+            if not no_voice:
+                # Initialize Voice components
+                voice_input = voice_output = None
+                try:
+                    # Heavy modules are imported only here, so --help and
+                    # text mode never load the audio libraries
+                    from voice_input import VoiceInput
+                    from voice_output import VoiceOutput
+                    
+                    input_future = pool.submit(VoiceInput)
+                    try:
+                        voice_output = VoiceOutput()
+                    finally:
+                        # Wait for the microphone even if TTS failed, so it can be released
+                        voice_input = input_future.result()
+                    self.voice_input, self.voice_output = voice_input, voice_output
+                except Exception as e:
+                    print(f"{Fore.RED}Error initializing voice components: {e}")
+                    print(f"{Fore.YELLOW}Falling back to text-only mode")
+                    # Release whichever component did start
+                    for component in (voice_input, voice_output):
+                        if component is not None:
+                            component.close()
+                    self.no_voice = True
+            
+            self.agent = agent_future.result()
+        
+        if not self.no_voice:
+            # Fixed phrases play instantly once they are in the speech cache
+            self.voice_output.prerender(
+                [WELCOME_MESSAGE, "Yes?", "Goodbye!"] + self.agent.fixed_responses()
+            )
         
         print(f"\n{Fore.GREEN}{Style.BRIGHT}Ready to assist!{Style.RESET_ALL}\n")
+        if config.VERBOSE:
+            print(f"{Fore.YELLOW}Startup took {time.perf_counter() - start:.1f}s")
+    
+    @staticmethod
+    def _load_agent(model_name: str, quantize: bool, speculative: bool):
+        """Load the AI agent and run a warm-up generation"""
+        # torch and transformers are imported only here, so --help and
+        # argument errors return immediately
+        from ai_agent import AIAgent
+        
+        agent = AIAgent(model_name=model_name, quantize=quantize, speculative=speculative)
+        if config.ENABLE_WARMUP:
+            agent.warmup()
+        return agent
+    
+    def stream_reply(self, text: str) -> str:
+        """
+        Print the agent's reply as it is generated
+        
+        Args:
+            text: User input to respond to
+            
+        Returns:
+            The complete response text
+        """
+        return "".join(self.echo_reply(text))
     
-    def run_voice_mode(self):
+    def echo_reply(self, text: str) -> Iterator[str]:
+        """
+        Yield the agent's reply piece by piece, printing each as it arrives
+        
+        Args:
+            text: User input to respond to
+            
+        Yields:
+            Pieces of the response text
+        """
+        print(f"{Fore.GREEN}Agent: ", end="", flush=True)
+        try:
+            for piece in self.agent.stream_command(text):
+                print(f"{Fore.GREEN}{Style.BRIGHT}{piece}", end="", flush=True)
+                yield piece
+        finally:
+            print()
+    
+    async def run_voice_mode(self):
         """Run the assistant in voice-interactive mode"""
         print(f"{Fore.CYAN}Voice mode activated!")
         print(f"{Fore.YELLOW}Tips for best results:")
@@ -60,65 +137,88 @@ class VoiceAIAssistant:
         print(f"{Fore.YELLOW}Say 'goodbye' or 'exit' to quit\n")
         
         # Welcome message
-        self.voice_output.speak("Hello! I'm your AI assistant. How can I help you today?")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.voice_output.speak, WELCOME_MESSAGE)
         
-        def handle_voice_input(text: str):
-            """Handle recognized voice input"""
-            print(f"{Fore.BLUE}You: {Style.BRIGHT}{text}")
-            
-            # Process with AI agent
-            response = self.agent.process_command(text)
-            
-            # Speak response
-            self.voice_output.speak(response)
-            
-            # Check for exit commands
-            if any(word in text.lower() for word in ["exit", "quit", "goodbye", "bye"]):
-                sys.exit(0)
+        from pipeline import VoicePipeline
         
-        try:
-            # Start continuous listening
-            self.voice_input.continuous_listen(handle_voice_input)
-        except KeyboardInterrupt:
-            print(f"\n{Fore.YELLOW}Shutting down...")
-            self.voice_output.speak("Goodbye!")
+        # Listening continues while replies are generated and spoken, and
+        # each reply is spoken sentence by sentence as it is generated
+        pipeline = VoicePipeline(self.voice_input, self.voice_output, self.echo_reply)
+        await pipeline.run()
     
-    def run_text_mode(self):
+    async def run_text_mode(self):
         """Run the assistant in text-only mode"""
+        from pipeline import EXIT_WORDS, read_line
+        
         print(f"{Fore.CYAN}Text mode activated!")
         print(f"{Fore.YELLOW}Type your messages and press Enter")
         print(f"{Fore.YELLOW}Type 'exit', 'quit', or 'goodbye' to quit\n")
         
-        print(f"{Fore.GREEN}Agent: Hello! I'm your AI assistant. How can I help you today?")
+        print(f"{Fore.GREEN}Agent: {WELCOME_MESSAGE}")
         
+        loop = asyncio.get_running_loop()
+        inference = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
         try:
             while True:
                 # Get user input
-                user_input = input(f"{Fore.BLUE}You: {Style.RESET_ALL}").strip()
+                user_input = (await read_line(f"{Fore.BLUE}You: {Style.RESET_ALL}")).strip()
                 
                 if not user_input:
                     continue
                 
-                # Process with AI agent
-                response = self.agent.process_command(user_input)
-                
-                # Display response
-                print(f"{Fore.GREEN}Agent: {Style.BRIGHT}{response}")
+                # Process with AI agent, displaying the response as it streams
+                await loop.run_in_executor(inference, self.stream_reply, user_input)
                 
                 # Check for exit commands
-                if any(word in user_input.lower() for word in ["exit", "quit", "goodbye", "bye"]):
+                if any(word in user_input.lower() for word in EXIT_WORDS):
                     break
-                    
-        except KeyboardInterrupt:
-            print(f"\n{Fore.YELLOW}Shutting down...")
-            print(f"{Fore.GREEN}Agent: Goodbye!")
+        finally:
+            inference.shutdown(wait=False)
     
     def run(self):
-        """Run the assistant in appropriate mode"""
+        """Run the assistant in appropriate mode on an asyncio event loop"""
         if self.no_voice:
-            self.run_text_mode()
+            try:
+                asyncio.run(self.run_text_mode())
+            except KeyboardInterrupt:
+                print(f"\n{Fore.YELLOW}Shutting down...")
+                print(f"{Fore.GREEN}Agent: Goodbye!")
         else:
-            self.run_voice_mode()
+            try:
+                asyncio.run(self.run_voice_mode())
+            except KeyboardInterrupt:
+                print(f"\n{Fore.YELLOW}Shutting down...")
+                self.voice_output.speak("Goodbye!")
+            finally:
+                self.voice_input.close()
+                self.voice_output.close()
+
+
+def run_server(model_name: str, quantize: bool, speculative: bool, host: str, port: int,
+               workers: int = config.WORKER_PROCESSES):
+    """Load the model once (or once per worker process) and serve it to local clients"""
+    from server import AIOHTTP_AVAILABLE, InferenceServer
+    
+    if not AIOHTTP_AVAILABLE:
+        raise ImportError("aiohttp not available. Install with: pip install aiohttp")
+    
+    if workers <= 1:
+        agent = VoiceAIAssistant._load_agent(model_name, quantize, speculative)
+        InferenceServer(agent).run(host, port)
+        return
+    
+    from worker_pool import WorkerPool
+    
+    pool = WorkerPool(model_name, workers=workers, quantize=quantize,
+                      speculative=speculative)
+    try:
+        # Enough slots to keep every worker busy
+        server = InferenceServer(None, sessions=pool,
+                                 max_concurrency=max(config.SERVER_MAX_CONCURRENCY, workers))
+        server.run(host, port)
+    finally:
+        pool.close()
 
 
 def main():
@@ -131,7 +231,11 @@ Examples:
   python main.py                    # Run with default settings (voice mode)
   python main.py --text             # Run in text-only mode (no voice)
   python main.py --model small      # Use smaller/faster model
+  python main.py --model large --quantize  # Large model with int8 weights (CPU)
+  python main.py --model large --speculative  # Large model, small model drafting
   python main.py --no-wake-word     # Disable wake word requirement
+  python main.py --serve            # Serve the model over local HTTP/WebSocket
+  python main.py --serve --workers 4  # Serve from 4 processes, each on its own cores
         """
     )
     
@@ -148,12 +252,52 @@ Examples:
         help="Choose model size (default: medium)"
     )
     
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        default=config.QUANTIZE_INT8,
+        help="Load the model with dynamic int8 quantization (CPU only)"
+    )
+    
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        default=config.ENABLE_SPECULATIVE_DECODING,
+        help="Draft tokens with the small model and verify them with the selected one"
+    )
+    
     parser.add_argument(
         "--no-wake-word",
         action="store_true",
         help="Disable wake word requirement (always listening)"
     )
     
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve the model to local clients over HTTP and WebSocket"
+    )
+    
+    parser.add_argument(
+        "--host",
+        default=config.SERVER_HOST,
+        help=f"Interface for --serve (default: {config.SERVER_HOST})"
+    )
+    
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=config.SERVER_PORT,
+        help=f"Port for --serve (default: {config.SERVER_PORT})"
+    )
+    
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.WORKER_PROCESSES,
+        help=f"Agent processes for --serve, each pinned to its own cores (default: {config.WORKER_PROCESSES})"
+    )
+    
     args = parser.parse_args()
     
     # Configure based on arguments
@@ -171,7 +315,21 @@ Examples:
     
     # Create and run assistant
     try:
-        assistant = VoiceAIAssistant(model_name=model_name, no_voice=args.text)
+        if args.serve:
+            run_server(model_name, args.quantize, args.speculative, args.host, args.port,
+                       args.workers)
+            return
+        
+        if config.METRICS_PORT:
+            import metrics
+            metrics.serve_metrics(config.METRICS_PORT)
+        
+        assistant = VoiceAIAssistant(
+            model_name=model_name,
+            no_voice=args.text,
+            quantize=args.quantize,
+            speculative=args.speculative
+        )
         assistant.run()
     except Exception as e:
         print(f"{Fore.RED}Fatal error: {e}")
@@ -0,0 +1,354 @@
+"""
+Metrics Module
+Low-overhead counters, gauges and histograms with Prometheus text export
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock, Thread
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import config
+from colorama import Fore, init
+
+init(autoreset=True)
+
+# Seconds, from a fast cache hit to a long spoken reply
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    """A named metric with one value per combination of label values"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Args:
+            name: Prometheus metric name
+            documentation: One-line description
+            labelnames: Names of the labels that split the metric
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        # (label name, label value) -> exported values of another process
+        self._remote = {}
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        """Prometheus text exposition lines"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+            remote = list(self._remote.items())
+        for key, value in items:
+            lines.extend(self._render_value(self.labelnames, key, value))
+        for (label, source), exported in remote:
+            for key, value in exported:
+                lines.extend(self._render_value(self.labelnames + (label,), key + (source,), value))
+        return lines
+
+    def _render_value(self, names: Tuple, key: Tuple, value) -> List[str]:
+        return [f"{self.name}{_format_labels(names, key)} {value}"]
+
+    def export(self) -> List[Tuple]:
+        """Current values as plain data, to be rendered by another process"""
+        with self._lock:
+            items = list(self._values.items())
+        return [(key, self._export_value(value)) for key, value in items]
+
+    def _export_value(self, value):
+        return value
+
+    def set_remote(self, label: str, source: str, exported: List[Tuple]):
+        """Render values exported by another process, told apart by an extra label"""
+        with self._lock:
+            self._remote[(label, source)] = exported
+
+    def snapshot(self) -> Dict[str, object]:
+        """Current values keyed by their label string"""
+        with self._lock:
+            items = list(self._values.items())
+        return {_format_labels(self.labelnames, key): self._snapshot_value(value)
+                for key, value in items}
+
+    def _snapshot_value(self, value):
+        return value
+
+
+class Counter(_Metric):
+    """A total that only goes up, e.g. cache lookups"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. a queue depth"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, func: Callable[[], float], **labels):
+        """Read the value from func whenever the metric is collected"""
+        self.set(func, **labels)
+
+    def value(self, **labels) -> Optional[float]:
+        value = self._values.get(self._key(labels))
+        return self._snapshot_value(value) if value is not None else None
+
+    def _render_value(self, names: Tuple, key: Tuple, value) -> List[str]:
+        return super()._render_value(names, key, self._snapshot_value(value))
+
+    def _export_value(self, value):
+        return self._snapshot_value(value)
+
+    def _snapshot_value(self, value):
+        if not callable(value):
+            return value
+        try:
+            return value()
+        except Exception:
+            return float("nan")
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed buckets, e.g. stage latencies"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            buckets: Upper bounds of the buckets, ascending (+Inf is implied)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (not cumulative), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of a block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket"""
+        state = self._values.get(self._key(labels))
+        return self._quantile(state, q) if state else None
+
+    def _quantile(self, state, q: float) -> Optional[float]:
+        counts, _, total = state
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # Beyond the last bound
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def _render_value(self, names: Tuple, key: Tuple, state) -> List[str]:
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+        for bound, bucket_count in zip(bounds, counts):
+            cumulative += bucket_count
+            labels = _format_labels(names + ("le",), key + (bound,))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(names, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def _export_value(self, state):
+        counts, total, count = state
+        return [list(counts), total, count]
+
+    def _snapshot_value(self, state) -> Dict[str, float]:
+        counts, total, count = state
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else None,
+            "p50": self._quantile(state, 0.5),
+            "p95": self._quantile(state, 0.95),
+        }
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def _register(self, metric_type, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_type(name, *args, **kwargs)
+            elif not isinstance(metric, metric_type):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> Dict[str, List[Tuple]]:
+        """Values of all metrics as plain data, e.g. to send from a worker process"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.export() for metric in metrics}
+
+    def merge(self, label: str, source: str, exported: Dict[str, List[Tuple]]):
+        """
+        Render metrics exported by another process alongside this one's
+
+        Args:
+            label: Label that tells the sources apart, e.g. "worker"
+            source: Value of that label for this source
+            exported: Result of the other process's export()
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in exported.items():
+            metric = metrics.get(name)
+            if metric is not None:
+                metric.set_remote(label, source, values)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """All metrics as plain values, for use in-process"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+REGISTRY = MetricsRegistry()
+
+# Metrics recorded by the assistant
+LISTEN_SECONDS = REGISTRY.histogram(
+    "assistant_listen_seconds", "Time spent capturing and recognizing speech", ["stage"])
+GENERATE_SECONDS = REGISTRY.histogram(
+    "assistant_generate_seconds", "Time spent in each stage of generating a reply", ["stage"])
+REPLY_SECONDS = REGISTRY.histogram(
+    "assistant_reply_seconds", "Time to produce a complete reply", ["source"])
+PROMPT_TOKENS = REGISTRY.histogram(
+    "assistant_prompt_tokens", "Prompt tokens run through the model per reply",
+    buckets=TOKEN_BUCKETS)
+GENERATED_TOKENS = REGISTRY.histogram(
+    "assistant_generated_tokens", "Tokens generated per reply", buckets=TOKEN_BUCKETS)
+SPEAK_SECONDS = REGISTRY.histogram(
+    "assistant_speak_seconds", "Time spent synthesizing and playing speech", ["stage"])
+CACHE_LOOKUPS = REGISTRY.counter(
+    "assistant_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+QUEUE_DEPTH = REGISTRY.gauge(
+    "assistant_queue_depth", "Items waiting in each queue", ["queue"])
+SPECULATIVE_TOKENS = REGISTRY.counter(
+    "assistant_speculative_tokens_total",
+    "Tokens proposed by the draft model and accepted by the main model", ["result"])
+SPECULATIVE_ACCEPTANCE = REGISTRY.gauge(
+    "assistant_speculative_acceptance_ratio", "Share of drafted tokens accepted so far")
+
+
+def serve_metrics(port: int = config.METRICS_PORT, host: str = config.SERVER_HOST):
+    """
+    Serve /metrics in the Prometheus text format on a background thread
+
+    Args:
+        port: Port to listen on
+        host: Interface to listen on
+
+    Returns:
+        The running HTTPServer (call shutdown() to stop it)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes would otherwise print over the conversation
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    if config.VERBOSE:
+        print(f"{Fore.YELLOW}Metrics at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,94 @@
+"""
+Model Snapshot Module
+Keeps ready-to-run copies of models under MODELS_DIR for fast cold starts
+"""
+
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+import torch
+import transformers
+import config
+from colorama import Fore, init
+
+init(autoreset=True)
+
+MANIFEST_NAME = "snapshot.json"
+
+
+def snapshot_dir(model_name: str, dtype: torch.dtype) -> Path:
+    """
+    Directory holding the snapshot of a model in a given dtype
+
+    Args:
+        model_name: Hugging Face model name or local path
+        dtype: Weight dtype the snapshot is stored in
+    """
+    name = model_name.strip("/").replace("/", "--")
+    return config.MODELS_DIR / f"{name}-{str(dtype).replace('torch.', '')}"
+
+
+def find_snapshot(model_name: str, dtype: torch.dtype) -> Optional[Path]:
+    """
+    Return the snapshot directory if a usable snapshot exists
+
+    Snapshots written by a different transformers version are ignored, so
+    upgrades rebuild them instead of loading a stale layout.
+    """
+    path = snapshot_dir(model_name, dtype)
+    try:
+        manifest = json.loads((path / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get("transformers_version") != transformers.__version__:
+        return None
+    return path
+
+
+def save_snapshot(model, tokenizer, model_name: str) -> Optional[Path]:
+    """
+    Write a model and tokenizer as safetensors in their current dtype
+
+    The snapshot is written to a temporary directory and renamed into place,
+    so an interrupted write never leaves a half-written snapshot behind.
+
+    Args:
+        model: Loaded model, already converted to the target dtype
+        tokenizer: Matching tokenizer
+        model_name: Name the model was loaded from
+
+    Returns:
+        Snapshot directory, or None if it could not be written
+    """
+    path = snapshot_dir(model_name, model.dtype)
+    staging = path.with_name(path.name + ".tmp")
+
+    try:
+        config.MODELS_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.rmtree(staging, ignore_errors=True)
+
+        model.save_pretrained(staging, safe_serialization=True)
+        tokenizer.save_pretrained(staging)
+        (staging / MANIFEST_NAME).write_text(json.dumps({
+            "model_name": model_name,
+            "dtype": str(model.dtype),
+            "transformers_version": transformers.__version__,
+            "torch_version": torch.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }, indent=2))
+
+        shutil.rmtree(path, ignore_errors=True)
+        staging.rename(path)
+
+        if config.VERBOSE:
+            print(f"{Fore.YELLOW}Saved model snapshot to {path}")
+        return path
+
+    except Exception as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        if config.DEBUG:
+            print(f"{Fore.RED}Error saving model snapshot: {e}")
+        return None
@@ -0,0 +1,393 @@
+"""
+Voice Pipeline Module
+Runs listening, recognition, generation and speech as asyncio tasks
+"""
+
+import asyncio
+import queue
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from threading import Event, Thread
+from typing import AsyncIterator, Callable, Iterable, Optional
+import config
+import metrics
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+EXIT_WORDS = ["exit", "quit", "goodbye", "bye"]
+
+
+async def iterate_in_executor(executor: Optional[Executor], func: Callable[..., Iterable],
+                              *args) -> AsyncIterator:
+    """
+    Run a blocking generator in an executor, yielding its items on the event loop
+
+    Items are handed over as soon as they are produced. Closing the async
+    iterator early stops the generator at its next item.
+
+    Args:
+        executor: Executor to run the generator in (None for the loop's default)
+        func: Returns the generator
+        *args: Arguments for func
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    done = object()
+    stopped = Event()
+
+    def produce():
+        try:
+            for item in func(*args):
+                loop.call_soon_threadsafe(items.put_nowait, item)
+                if stopped.is_set():
+                    break
+        finally:
+            loop.call_soon_threadsafe(items.put_nowait, done)
+
+    future = loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await items.get()
+            if item is done:
+                break
+            yield item
+        await future  # Re-raise the generator's error
+    finally:
+        stopped.set()
+
+
+async def read_line(prompt: str = "") -> str:
+    """
+    Read a line from standard input without blocking the event loop
+
+    The read runs on a daemon thread, since it cannot be interrupted and
+    must not keep the process alive on exit.
+
+    Raises:
+        EOFError: If standard input is closed
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def read():
+        try:
+            result = input(prompt)
+        except BaseException as e:
+            error = e
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_exception(error))
+        else:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+
+    Thread(target=read, name="stdin", daemon=True).start()
+    return await future
+
+
+class VoicePipeline:
+    """
+    Listen -> recognize -> think -> speak, each stage an asyncio task
+
+    Stages are connected by bounded asyncio queues, so the microphone keeps
+    listening while the model generates and while the reply is spoken.
+    Blocking work runs in executors: one thread each for the microphone,
+    recognition, the model and playback, so a slow stage never holds up the
+    others and the event loop only coordinates.
+
+    Replies are streamed: speech starts with the first sentence while the
+    rest of the reply is still being generated.
+
+    Without barge-in, nothing is recorded while the assistant is talking,
+    so it never answers its own voice: phrases that start during a reply
+    are dropped, and listening resumes from the end of the reply. With barge-in
+    enabled, speech captured while the assistant is talking stops playback
+    and discards replies to earlier turns. Generation of a
+    discarded reply runs to completion, since the model cannot be stopped
+    mid-step, but nothing more of it is spoken.
+    """
+
+    def __init__(self, voice_input, voice_output,
+                 respond: Callable[[str], Iterable[str]],
+                 queue_size: int = config.PIPELINE_QUEUE_SIZE,
+                 barge_in: bool = config.ENABLE_BARGE_IN):
+        """
+        Args:
+            voice_input: VoiceInput used for capture and recognition
+            voice_output: VoiceOutput used for speech
+            respond: Produces (and displays) the reply to recognized text,
+                as pieces of text in order; called in an executor
+            queue_size: Capacity of each queue between stages
+            barge_in: Interrupt playback when the user starts talking
+        """
+        self.voice_input = voice_input
+        self.voice_output = voice_output
+        self.respond = respond
+        self.queue_size = queue_size
+        self.barge_in = barge_in
+
+        # Created by run(), on the event loop they belong to
+        self._loop = None
+        self._audio_queue = None
+        self._text_queue = None
+        self._speech_queue = None
+        self._tasks = []
+        self._executors = {}
+
+        self._pending = None  # Item read ahead by _speak_reply
+        self._reply = None  # Pieces being fed to the playback thread
+        self._spoken_turn = 0  # Newest turn whose reply has started playing
+        self._speaking = False  # A reply is being played
+        self._partial_shown = False  # A partial transcript is on the current line
+        # Start and end (None while playing) of recent replies, as monotonic times
+        self._playback = deque(maxlen=8)
+        self._awake = False  # Wake word heard; the next phrase is a command
+        self._turn = 0  # Incremented per captured phrase, for barge-in
+
+    async def run(self):
+        """Run all stages until the user says goodbye or stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._audio_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._text_queue = asyncio.Queue(maxsize=self.queue_size)
+        # Holds reply pieces rather than whole replies; a reply is at most
+        # MAX_RESPONSE_LENGTH tokens, so this one is left unbounded
+        self._speech_queue = asyncio.Queue()
+        for name, stage_queue in (("audio", self._audio_queue), ("text", self._text_queue),
+                                  ("speech", self._speech_queue)):
+            metrics.QUEUE_DEPTH.set_function(stage_queue.qsize, queue=name)
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"pipeline-{stage}")
+            for stage in ("capture", "recognition", "inference", "playback")
+        }
+
+        if config.ENABLE_WAKE_WORD:
+            print(f"{Fore.MAGENTA}Say '{config.WAKE_WORD}' to activate...")
+
+        self._tasks = [
+            asyncio.create_task(self._capture_loop()),
+            asyncio.create_task(self._recognition_loop()),
+            asyncio.create_task(self._generation_loop()),
+            asyncio.create_task(self._speech_loop()),
+        ]
+        try:
+            done, _ = await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled():
+                    task.result()  # Re-raise a stage's error
+        finally:
+            await self._shutdown()
+
+    def stop(self):
+        """Stop all stages; safe to call from any thread"""
+        if self._loop is not None and self._tasks:
+            self._loop.call_soon_threadsafe(self._tasks[-1].cancel)
+
+    def interrupt(self):
+        """Stop the current reply and drop replies that are still queued"""
+        self.voice_output.stop()
+        while not self._speech_queue.empty():
+            self._speech_queue.get_nowait()
+        if self._reply is not None:
+            self._reply.put(None)
+
+    async def _shutdown(self):
+        """Cancel the stages and release their threads"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        self.voice_output.stop()
+        if self._reply is not None:
+            self._reply.put(None)
+
+        # Threads still blocked in a call (e.g. capture) finish on their own
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
+
+    def _run(self, stage: str, func: Callable, *args, **kwargs) -> asyncio.Future:
+        """Run a blocking call on a stage's thread"""
+        return self._loop.run_in_executor(self._executors[stage], partial(func, *args, **kwargs))
+
+    async def _capture_loop(self):
+        """Record phrases from the microphone, after the wake word if spotted locally"""
+        spotting = config.ENABLE_WAKE_WORD and self.voice_input.spotter is not None
+        woken = False  # Spotter heard the wake word; the next phrase is a command
+
+        while True:
+            # After the wake word the capture re-reads audio from before the
+            # detection, so a command in the same breath survives the "Yes?"
+            if not woken and not self.barge_in and self._assistant_speaking():
+                await self._wait_until_quiet()
+
+            if spotting and not woken:
+                if await self._run("capture", self.voice_input.spot_wake_word):
+                    woken = True
+                    print(f"{Fore.GREEN}Wake word detected!")
+                    if config.ENABLE_VOICE_FEEDBACK:
+                        # Numbered like the command that follows it
+                        await self._say_text(self._turn + 1, "Yes?")
+                continue
+
+            audio = await self._run("capture", self.voice_input.capture, prompt=None,
+                                    report_timeout=False, on_partial=self._show_partial)
+            if self._partial_shown:
+                print("\r\033[K", end="", flush=True)
+                self._partial_shown = False
+            if audio is None:
+                # Nobody spoke after the wake word; wait for it again
+                woken = False
+                continue
+
+            if not self.barge_in and self._during_playback(audio):
+                # The phrase started while a reply played, so it is likely its echo
+                if config.VERBOSE:
+                    print(f"{Fore.YELLOW}Ignoring speech recorded during playback")
+                continue
+
+            self._turn += 1
+            if self.barge_in and self.voice_output.is_speaking():
+                if config.VERBOSE:
+                    print(f"{Fore.YELLOW}Barge-in: interrupting playback")
+                self.interrupt()
+
+            await self._audio_queue.put((self._turn, audio, woken))
+            woken = False
+
+    def _show_partial(self, text: str):
+        """Show the words recognized so far on one line; called on the capture thread"""
+        self._partial_shown = True
+        print(f"\r{Fore.CYAN}... {text}\033[K", end="", flush=True)
+
+    def _assistant_speaking(self) -> bool:
+        """Whether a reply is playing or queued to play"""
+        return self._speaking or not self._speech_queue.empty() or self.voice_output.is_speaking()
+
+    def _during_playback(self, audio) -> bool:
+        """Whether a captured phrase started while a reply was playing"""
+        times = self.voice_input.phrase_times(audio)
+        if times is None:
+            return self._assistant_speaking()
+        start = times[0]
+        echo = config.PLAYBACK_ECHO_MS / 1000
+        return any(began <= start and (ended is None or start <= ended + echo)
+                   for began, ended in self._playback)
+
+    async def _wait_until_quiet(self):
+        """Wait for playback to finish, then skip the audio recorded meanwhile"""
+        while self._assistant_speaking():
+            await asyncio.sleep(0.05)
+        await self._run("capture", self.voice_input.skip_buffered)
+
+    async def _recognition_loop(self):
+        """Turn recorded phrases into text, applying the wake word"""
+        while True:
+            turn, audio, woken = await self._audio_queue.get()
+
+            text = await self._run("recognition", self.voice_input.recognize, audio)
+            if not text:
+                continue
+
+            # Without a spotter the wake word is looked for in the transcript.
+            # Spotted phrases can start with it too, since the capture re-reads
+            # a little audio from before the detection
+            if config.ENABLE_WAKE_WORD and not self._awake:
+                lowered = text.lower()
+                wake_word = config.WAKE_WORD.lower()
+                if wake_word in lowered:
+                    # A command spoken in the same breath as the wake word is kept
+                    text = text[lowered.index(wake_word) + len(wake_word):].strip(" ,.!?")
+                    if not woken:
+                        print(f"{Fore.GREEN}Wake word detected!")
+                        if not text:
+                            self._awake = True
+                            if config.ENABLE_VOICE_FEEDBACK:
+                                await self._say_text(turn, "Yes?")
+                            continue
+                elif not woken:
+                    continue
+
+                if not text:
+                    continue
+
+            self._awake = False
+            await self._text_queue.put((turn, text))
+
+    async def _generation_loop(self):
+        """Produce replies to recognized text, running the model in its executor"""
+        while True:
+            turn, text = await self._text_queue.get()
+
+            print(f"{Fore.BLUE}You: {Style.BRIGHT}{text}")
+            is_exit = any(word in text.lower() for word in EXIT_WORDS)
+            pieces = iterate_in_executor(self._executors["inference"], self.respond, text)
+            try:
+                async for piece in pieces:
+                    # Pieces of a reply superseded by a barge-in are dropped
+                    if not self._is_stale(turn, is_exit):
+                        await self._speech_queue.put((turn, piece, is_exit))
+            finally:
+                await pieces.aclose()
+            await self._speech_queue.put((turn, None, is_exit))
+
+    async def _say_text(self, turn: int, text: str):
+        """Queue a fixed reply for speech, followed by an end marker"""
+        await self._speech_queue.put((turn, text, False))
+        await self._speech_queue.put((turn, None, False))
+
+    async def _speech_loop(self):
+        """Speak replies, skipping those superseded by a barge-in"""
+        while True:
+            if self._pending is not None:
+                item, self._pending = self._pending, None
+            else:
+                item = await self._speech_queue.get()
+            turn, piece, is_exit = item
+
+            # End of a reply already cut short, the rest of a reply that a
+            # newer one interrupted, or a stale reply
+            if piece is None or turn < self._spoken_turn or self._is_stale(turn, is_exit):
+                continue
+
+            self._spoken_turn = turn
+            playback = [time.monotonic(), None]
+            self._playback.append(playback)
+            self._speaking = True
+            try:
+                await self._speak_reply(turn, piece, is_exit)
+            finally:
+                playback[1] = time.monotonic()
+                self._speaking = False
+            if is_exit:
+                return
+
+    async def _speak_reply(self, turn: int, first: str, is_exit: bool):
+        """
+        Speak one reply on the playback thread, passing it pieces as they arrive
+
+        The reply ends at its end marker, when a newer reply shows up, or when
+        interrupt() closes it.
+        """
+        reply = queue.SimpleQueue()
+        reply.put(first)
+        self._reply = reply
+        playback = self._run("playback", self.voice_output.speak_stream, iter(reply.get, None))
+        try:
+            while not self._is_stale(turn, is_exit):
+                item = await self._speech_queue.get()
+                if item[0] != turn:
+                    # The end marker was drained by a barge-in; keep the next reply
+                    self._pending = item
+                    break
+                if item[1] is None:
+                    break
+                reply.put(item[1])
+        finally:
+            reply.put(None)
+            if self._reply is reply:
+                self._reply = None
+        await playback
+
+    def _is_stale(self, turn: int, is_exit: bool) -> bool:
+        """Whether the user spoke again after this turn (only with barge-in)"""
+        return self.barge_in and turn < self._turn and not is_exit
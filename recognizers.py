@@ -0,0 +1,174 @@
+"""
+Speech Recognizer Backends
+Interchangeable speech-to-text engines used by VoiceInput
+"""
+
+import json
+from typing import Optional
+import config
+
+
+def load_vosk_model(model_path=config.VOSK_MODEL_PATH):
+    """
+    Load a Vosk model
+
+    Args:
+        model_path: Directory of an unpacked Vosk model
+
+    Returns:
+        The loaded model
+    """
+    try:
+        import vosk
+    except ImportError:
+        raise ImportError("vosk not available. Install with: pip install vosk")
+
+    if not model_path.exists():
+        raise FileNotFoundError(
+            f"Vosk model not found at {model_path}. "
+            f"Download one from https://alphacephei.com/vosk/models"
+        )
+
+    vosk.SetLogLevel(-1)
+    return vosk.Model(str(model_path))
+
+
+class RecognitionStream:
+    """Incremental decoding of one phrase, fed audio as it is captured"""
+
+    def accept(self, pcm: bytes) -> Optional[str]:
+        """
+        Decode more audio
+
+        Args:
+            pcm: 16-bit mono PCM following the audio already accepted
+
+        Returns:
+            Partial transcript so far, or None if there is none yet
+        """
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        """Final transcript of the phrase (empty if nothing was understood)"""
+        raise NotImplementedError
+
+
+class RecognizerBackend:
+    """
+    Speech-to-text engine
+
+    Every backend transcribes recorded phrases. Streaming backends can also
+    decode a phrase while it is being recorded, so the transcript is ready
+    as soon as the speaker stops.
+    """
+
+    name = "base"
+    streaming = False
+
+    def transcribe(self, audio) -> str:
+        """
+        Transcribe a recorded phrase
+
+        Args:
+            audio: speech_recognition AudioData
+
+        Returns:
+            Transcript (empty if nothing was understood)
+        """
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate: int) -> RecognitionStream:
+        """Begin decoding a phrase incrementally (streaming backends only)"""
+        raise NotImplementedError(f"{self.name} recognizer does not support streaming")
+
+
+class GoogleRecognizer(RecognizerBackend):
+    """Google Web Speech API (online, free, no API key needed)"""
+
+    name = "google"
+
+    def __init__(self, recognizer, language: str = config.SPEECH_RECOGNITION_LANGUAGE):
+        """
+        Args:
+            recognizer: speech_recognition Recognizer used to call the API
+            language: Recognition language
+        """
+        self.recognizer = recognizer
+        self.language = language
+
+    def transcribe(self, audio) -> str:
+        """Transcribe a phrase; raises speech_recognition errors on failure"""
+        import speech_recognition as sr
+
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+
+class _VoskStream(RecognitionStream):
+    """Vosk decoder for one phrase"""
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self._parts = []  # Text of the parts Vosk has already finalized
+        self._partial = ""
+
+    def accept(self, pcm: bytes) -> Optional[str]:
+        if self.recognizer.AcceptWaveform(bytes(pcm)):
+            # Vosk found a pause inside the phrase and finalized that part
+            self._parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+            self._partial = ""
+        else:
+            self._partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return self._join(self._parts + [self._partial]) or None
+
+    def finish(self) -> str:
+        self._parts.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        return self._join(self._parts)
+
+    @staticmethod
+    def _join(parts) -> str:
+        return " ".join(part for part in parts if part)
+
+
+class VoskRecognizer(RecognizerBackend):
+    """Vosk/Kaldi recognizer (offline, CPU, streaming)"""
+
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path=config.VOSK_MODEL_PATH):
+        """
+        Args:
+            model_path: Directory of an unpacked Vosk model
+        """
+        self.model = load_vosk_model(model_path)
+
+    def start_stream(self, sample_rate: int) -> RecognitionStream:
+        import vosk
+
+        return _VoskStream(vosk.KaldiRecognizer(self.model, sample_rate))
+
+    def transcribe(self, audio) -> str:
+        stream = self.start_stream(audio.sample_rate)
+        stream.accept(audio.get_raw_data(convert_width=2))
+        return stream.finish()
+
+
+def create_recognizer(name: str, recognizer) -> RecognizerBackend:
+    """
+    Create a recognizer backend by name
+
+    Args:
+        name: "google" (online) or "vosk" (offline, streaming)
+        recognizer: speech_recognition Recognizer, for backends that use it
+
+    Returns:
+        The backend
+    """
+    if name == "google":
+        return GoogleRecognizer(recognizer)
+    if name == "vosk":
+        return VoskRecognizer()
+    raise ValueError(f"Unknown recognizer backend: {name}")
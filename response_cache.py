@@ -0,0 +1,145 @@
+"""
+Response Cache Module
+Remembers replies to prompts the model has already answered
+"""
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Sequence
+import config
+from colorama import Fore, init
+
+init(autoreset=True)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class ResponseCache:
+    """
+    Generated replies, addressed by everything that shapes them
+
+    Entries are token ids of the reply, kept in an LRU with a time to live,
+    so a hit replays the reply into the conversation history exactly as if
+    it had been generated. Optionally the cache is saved as JSON and loaded
+    again at the next start.
+    """
+
+    def __init__(self, max_items: int = config.RESPONSE_CACHE_SIZE,
+                 ttl_seconds: float = config.RESPONSE_CACHE_TTL,
+                 path: Optional[Path] = None):
+        """
+        Args:
+            max_items: Replies kept; the least recently used go first
+            ttl_seconds: Age after which a reply is generated afresh (0 for no limit)
+            path: JSON file to persist the cache in (None keeps it in memory only)
+        """
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        # key -> (expiry as a Unix time or None, reply token ids)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+        if path is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Fold case, whitespace and trailing punctuation that do not change the question"""
+        return _WHITESPACE.sub(" ", text).strip(" .!?,").lower()
+
+    @classmethod
+    def key(cls, user_input: str, context: bytes, model_name: str, settings: Dict,
+            quantized: bool = False) -> str:
+        """
+        Content address of a reply
+
+        Args:
+            user_input: The user's message (normalized here)
+            context: Encoded conversation the message follows (empty if none)
+            model_name: Model generating the reply
+            settings: Generation settings, including sampling parameters
+            quantized: Whether the model runs with int8 weights
+        """
+        payload = json.dumps(
+            [cls.normalize(user_input), hashlib.sha256(context).hexdigest(), model_name,
+             quantized, settings],
+            sort_keys=True, default=repr,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[int]]:
+        """Reply token ids for a key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, key: str, reply_ids: Sequence[int]):
+        """Store a reply, evicting the least recently used beyond max_items"""
+        expires = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (expires, list(reply_ids))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+            if self.path is not None:
+                self._save()
+
+    def clear(self):
+        """Forget all replies"""
+        with self._lock:
+            self._entries.clear()
+            if self.path is not None:
+                self._save()
+
+    def _load(self):
+        """Read persisted replies that have not expired"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error loading response cache: {e}")
+            return
+
+        now = time.time()
+        for key, expires, reply_ids in entries[-self.max_items:]:
+            if expires is None or expires > now:
+                self._entries[key] = (expires, reply_ids)
+
+    def _save(self):
+        """Write the cache to disk, oldest entries first (called with the lock held)"""
+        entries = [[key, expires, reply_ids] for key, (expires, reply_ids) in self._entries.items()]
+        staging = self.path.with_name(f"{self.path.stem}.tmp{self.path.suffix}")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(staging, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            staging.replace(self.path)
+        except OSError as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error saving response cache: {e}")
+            staging.unlink(missing_ok=True)
@@ -0,0 +1,244 @@
+"""
+Inference Server Module
+Serves a loaded AIAgent (or a pool of them) to local clients over HTTP and WebSocket
+"""
+
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+import config
+import metrics
+from pipeline import iterate_in_executor
+from sessions import SessionManager
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+try:
+    from aiohttp import web, WSMsgType
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+    web = None
+
+
+class Overloaded(Exception):
+    """A request was refused because the server is busy"""
+
+
+class InferenceServer:
+    """
+    HTTP and WebSocket front end for a shared AIAgent
+
+    Endpoints:
+        POST   /v1/command          {"text": ..., "session": ...} -> {"session", "response"}
+        GET    /v1/stream           WebSocket; send the same JSON, receive
+                                    {"type": "piece"} messages then {"type": "done"}
+        DELETE /v1/sessions/{id}    Forget a conversation
+        GET    /health              Model name, sessions and load
+        GET    /metrics             Prometheus metrics
+
+    Each session keeps its own history (see SessionManager, or WorkerPool
+    for several agent processes). Requests run in a pool of max_concurrency
+    inference threads; up to max_queue more
+    wait for a slot, and anything beyond that is refused with 503 so
+    clients can back off instead of piling up.
+    """
+
+    def __init__(self, agent, max_concurrency: int = config.SERVER_MAX_CONCURRENCY,
+                 max_queue: int = config.SERVER_MAX_QUEUE,
+                 queue_timeout: float = config.SERVER_QUEUE_TIMEOUT,
+                 sessions=None):
+        """
+        Args:
+            agent: Loaded AIAgent shared by all clients (None when sessions is given)
+            max_concurrency: Requests generated at once
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Seconds a request may wait before it is refused
+            sessions: Backend with the SessionManager interface, e.g. a WorkerPool
+                (defaults to a SessionManager over agent)
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("aiohttp not available. Install with: pip install aiohttp")
+
+        self.agent = agent
+        self.sessions = sessions if sessions is not None else SessionManager(agent)
+        self.model_name = agent.model_name if agent is not None else self.sessions.model_name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="inference")
+        self._slots = None  # Created on the server's event loop
+        self._active = 0
+        self._waiting = 0
+        metrics.QUEUE_DEPTH.set_function(lambda: self._waiting, queue="server")
+
+        self.app = web.Application()
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+        self.app.add_routes([
+            web.post("/v1/command", self.handle_command),
+            web.get("/v1/stream", self.handle_stream),
+            web.delete("/v1/sessions/{session_id}", self.handle_end_session),
+            web.get("/health", self.handle_health),
+            web.get("/metrics", self.handle_metrics),
+        ])
+
+    async def _on_startup(self, app):
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def _on_cleanup(self, app):
+        self._executor.shutdown(wait=False)
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Wait for a free inference slot, refusing the request once the queue is full"""
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            raise Overloaded("Server busy: too many requests waiting")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Overloaded("Server busy: timed out waiting for a free slot")
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._slots.release()
+
+    @staticmethod
+    def _parse(body, default_session: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Validate a command request
+
+        Returns:
+            The text and the session id (a new one if the client gave none)
+
+        Raises:
+            ValueError: If the request is malformed
+        """
+        if not isinstance(body, dict):
+            raise ValueError("Request must be a JSON object")
+
+        text = body.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("'text' must be a non-empty string")
+
+        session_id = body.get("session") or default_session or uuid.uuid4().hex
+        if not isinstance(session_id, str):
+            raise ValueError("'session' must be a string")
+        return text, session_id
+
+    @staticmethod
+    def _error(status: int, message: str, headers: Optional[dict] = None) -> "web.Response":
+        return web.json_response({"error": message}, status=status, headers=headers)
+
+    async def handle_command(self, request: "web.Request") -> "web.Response":
+        """Generate a complete reply"""
+        try:
+            text, session_id = self._parse(await request.json())
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._slot():
+                response = await loop.run_in_executor(
+                    self._executor, self.sessions.process_command, session_id, text
+                )
+        except Overloaded as e:
+            return self._error(503, str(e), headers={"Retry-After": "1"})
+
+        return web.json_response({"session": session_id, "response": response})
+
+    async def handle_stream(self, request: "web.Request") -> "web.WebSocketResponse":
+        """Stream replies over a WebSocket, one command per message"""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+
+        # Messages without a session continue this connection's conversation
+        connection_session = uuid.uuid4().hex
+
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+
+            try:
+                text, session_id = self._parse(json.loads(message.data), connection_session)
+            except ValueError as e:
+                await ws.send_json({"type": "error", "error": str(e)})
+                continue
+
+            pieces = []
+            try:
+                async with self._slot():
+                    stream = iterate_in_executor(
+                        self._executor, self.sessions.stream_command, session_id, text
+                    )
+                    try:
+                        async for piece in stream:
+                            pieces.append(piece)
+                            # After a disconnect the reply is still finished,
+                            # so the session history stays consistent
+                            if not ws.closed:
+                                await ws.send_json({"type": "piece", "text": piece})
+                    finally:
+                        await stream.aclose()
+            except Overloaded as e:
+                await ws.send_json({"type": "error", "error": str(e)})
+                continue
+
+            if not ws.closed:
+                await ws.send_json({"type": "done", "session": session_id,
+                                    "response": "".join(pieces)})
+
+        return ws
+
+    async def handle_end_session(self, request: "web.Request") -> "web.Response":
+        """Forget a conversation"""
+        self.sessions.remove(request.match_info["session_id"])
+        return web.json_response({"removed": request.match_info["session_id"]})
+
+    async def handle_health(self, request: "web.Request") -> "web.Response":
+        """Report the model and current load"""
+        return web.json_response({
+            "status": "ok",
+            "model": self.model_name,
+            "sessions": len(self.sessions),
+            "active": self._active,
+            "waiting": self._waiting,
+        })
+
+    async def handle_metrics(self, request: "web.Request") -> "web.Response":
+        """Metrics in the Prometheus text format"""
+        return web.Response(text=metrics.REGISTRY.render(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def serve(self, host: str = config.SERVER_HOST, port: int = config.SERVER_PORT):
+        """Serve requests until cancelled"""
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, host, port).start()
+            print(f"{Fore.GREEN}{Style.BRIGHT}Serving {self.model_name} on http://{host}:{port}")
+            print(f"{Fore.YELLOW}Press Ctrl+C to stop")
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    def run(self, host: str = config.SERVER_HOST, port: int = config.SERVER_PORT):
+        """Serve requests until interrupted"""
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            print(f"\n{Fore.YELLOW}Shutting down server...")
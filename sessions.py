@@ -0,0 +1,250 @@
+"""
+Session Management Module
+Serves many conversations from one loaded model
+"""
+
+import time
+import torch
+from collections import OrderedDict
+from threading import Lock, RLock
+from typing import Dict, Iterator, Optional
+import config
+from history import TokenHistory
+from colorama import Fore, init
+
+init(autoreset=True)
+
+
+def _tensor_bytes(obj) -> int:
+    """Memory held by the tensors in an attention cache (any layout)"""
+    if isinstance(obj, torch.Tensor):
+        return obj.numel() * obj.element_size()
+    if isinstance(obj, (list, tuple)):
+        return sum(_tensor_bytes(item) for item in obj)
+    if hasattr(obj, "layers"):
+        return sum(
+            _tensor_bytes([getattr(layer, "keys", None), getattr(layer, "values", None)])
+            for layer in obj.layers
+        )
+    if hasattr(obj, "key_cache"):
+        return _tensor_bytes(obj.key_cache) + _tensor_bytes(obj.value_cache)
+    return 0
+
+
+class Session:
+    """State of one conversation: history, attention cache and settings"""
+
+    def __init__(self, session_id: str, settings: Optional[Dict] = None,
+                 max_turns: int = config.MAX_HISTORY_LENGTH):
+        """
+        Args:
+            session_id: Unique name of the conversation
+            settings: Generation overrides for this session
+                (e.g. temperature, top_p, max_new_tokens)
+            max_turns: Number of conversation turns to remember
+        """
+        self.session_id = session_id
+        self.settings = dict(settings or {})
+        self.history = TokenHistory(max_turns=max_turns)
+
+        # The attention cache and the token ids it was built from, reused
+        # while they remain a prefix of the next prompt
+        self.cache_ids = None
+        self.past_key_values = None
+
+        # Serializes turns so concurrent requests cannot interleave history
+        self.lock = Lock()
+
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def touch(self):
+        """Mark the session as recently used"""
+        self.last_used = time.monotonic()
+
+    def drop_cache(self):
+        """Release the attention cache; the next turn re-encodes the history"""
+        self.cache_ids = None
+        self.past_key_values = None
+
+    def clear(self):
+        """Forget the conversation"""
+        self.history.clear()
+        self.drop_cache()
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by this session"""
+        size = self.history.nbytes
+        size += _tensor_bytes(self.past_key_values)
+        if self.cache_ids is not None:
+            size += _tensor_bytes(self.cache_ids)
+        return size
+
+
+class SessionManager:
+    """
+    Shares one loaded AIAgent across many lightweight sessions
+
+    Sessions idle for longer than the TTL are evicted, and the least
+    recently used ones go first when the session count or memory cap is
+    exceeded. Under memory pressure attention caches are released before
+    whole sessions, since a session without a cache only costs a re-prefill.
+    """
+
+    def __init__(self, agent, max_sessions: int = config.MAX_SESSIONS,
+                 ttl_seconds: float = config.SESSION_TTL_SECONDS,
+                 max_memory_mb: float = config.SESSION_MEMORY_LIMIT_MB):
+        """
+        Args:
+            agent: Loaded AIAgent whose model and tokenizer are shared
+            max_sessions: Maximum number of live sessions
+            ttl_seconds: Idle time after which a session is evicted
+            max_memory_mb: Memory cap for session histories and caches
+        """
+        self.agent = agent
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str, settings: Optional[Dict] = None) -> Session:
+        """
+        Return a session, creating it if needed
+
+        Args:
+            session_id: Unique name of the conversation
+            settings: Generation overrides applied when the session is created
+
+        Returns:
+            The session, marked as most recently used
+        """
+        with self._lock:
+            self.evict_expired()
+
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, settings=settings)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.touch()
+
+            self._enforce_limits(keep=session)
+            return session
+
+    def remove(self, session_id: str):
+        """End a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def process_command(self, session_id: str, user_input: str) -> str:
+        """
+        Process user input within a session
+
+        Args:
+            session_id: Unique name of the conversation
+            user_input: User's input text
+
+        Returns:
+            Response text
+        """
+        session = self.get(session_id)
+        with session.lock:
+            response = self.agent.process_command(user_input, session=session)
+            session.touch()
+        self.trim_memory()
+        return response
+
+    def stream_command(self, session_id: str, user_input: str) -> Iterator[str]:
+        """
+        Process user input within a session, yielding the response as it is generated
+
+        Args:
+            session_id: Unique name of the conversation
+            user_input: User's input text
+
+        Yields:
+            Pieces of the response text, in order
+        """
+        session = self.get(session_id)
+        with session.lock:
+            yield from self.agent.stream_command(user_input, session=session)
+            session.touch()
+        self.trim_memory()
+
+    def evict_expired(self) -> int:
+        """
+        Remove sessions idle for longer than the TTL
+
+        Returns:
+            Number of sessions evicted
+        """
+        if not self.ttl_seconds:
+            return 0
+
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                session_id for session_id, session in self._sessions.items()
+                if session.last_used < cutoff and not session.lock.locked()
+            ]
+            for session_id in expired:
+                del self._sessions[session_id]
+
+        if expired and config.VERBOSE:
+            print(f"{Fore.YELLOW}Evicted {len(expired)} idle session(s)")
+        return len(expired)
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by all sessions"""
+        with self._lock:
+            return sum(session.memory_bytes() for session in self._sessions.values())
+
+    def trim_memory(self):
+        """Enforce the memory cap after a turn has grown a session"""
+        with self._lock:
+            self._enforce_limits()
+
+    def _enforce_limits(self, keep: Optional[Session] = None):
+        """Evict least recently used sessions (and caches) over the caps"""
+        # Oldest first; sessions mid-turn are never touched
+        while len(self._sessions) > self.max_sessions:
+            victim = self._least_recent(exclude=keep)
+            if victim is None:
+                break
+            del self._sessions[victim.session_id]
+
+        if not self.max_memory_bytes:
+            return
+
+        used = self.memory_bytes()
+        for session in list(self._sessions.values()):
+            if used <= self.max_memory_bytes:
+                return
+            if session is keep or session.lock.locked() or session.past_key_values is None:
+                continue
+            used -= session.memory_bytes()
+            session.drop_cache()
+            used += session.memory_bytes()
+
+        while used > self.max_memory_bytes:
+            victim = self._least_recent(exclude=keep)
+            if victim is None:
+                break
+            used -= victim.memory_bytes()
+            del self._sessions[victim.session_id]
+
+    def _least_recent(self, exclude: Optional[Session] = None) -> Optional[Session]:
+        """Least recently used session that is safe to evict"""
+        for session in self._sessions.values():
+            if session is not exclude and not session.lock.locked():
+                return session
+        return None
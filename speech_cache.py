@@ -0,0 +1,114 @@
+"""
+Speech Cache Module
+Keeps synthesized audio for repeated phrases in memory and on disk
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Optional
+import config
+from colorama import Fore, init
+
+init(autoreset=True)
+
+
+class SpeechCache:
+    """
+    Synthesized speech, addressed by everything that affects how it sounds
+
+    Decoded audio is kept in an in-memory LRU. The encoded audio is also
+    written to disk, so phrases survive restarts and play without another
+    synthesis.
+    """
+
+    def __init__(self, directory: Path = config.CACHE_DIR / "speech",
+                 max_items: int = config.SPEECH_CACHE_SIZE,
+                 max_files: int = config.SPEECH_CACHE_FILES):
+        """
+        Args:
+            directory: Where encoded audio is stored
+            max_items: Phrases kept decoded in memory
+            max_files: Phrases kept on disk; the least recently used go first
+        """
+        self.directory = directory
+        self.max_items = max_items
+        self.max_files = max_files
+        self._memory = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(text: str, engine: str, voice: str, rate, volume) -> str:
+        """Content address of a phrase spoken with the given settings"""
+        payload = json.dumps([text.strip(), engine, voice, rate, volume])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Decoded audio from memory, or None"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+            return audio
+
+    def put(self, key: str, audio: Any):
+        """Keep decoded audio in memory, evicting the least recently used"""
+        with self._lock:
+            self._memory[key] = audio
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def path(self, key: str, suffix: str) -> Path:
+        """File holding the encoded audio for a key"""
+        return self.directory / f"{key}.{suffix}"
+
+    def find(self, key: str, suffix: str) -> Optional[Path]:
+        """Encoded audio on disk, or None"""
+        path = self.path(key, suffix)
+        try:
+            # Refresh the modification time, which orders eviction
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, key: str, suffix: str, write: Callable[[Path], None]) -> Optional[Path]:
+        """
+        Write encoded audio to disk
+
+        Args:
+            key: Content address of the phrase
+            suffix: File extension of the encoding
+            write: Writes the audio to the path it is given
+
+        Returns:
+            Path of the stored audio, or None if it could not be written
+        """
+        path = self.path(key, suffix)
+        staging = path.with_name(f"{path.stem}.tmp.{suffix}")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write(staging)
+            staging.replace(path)
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error caching speech: {e}")
+            staging.unlink(missing_ok=True)
+            return None
+
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Delete the least recently used files beyond max_files"""
+        try:
+            files = sorted(self.directory.glob("*.*"), key=lambda file: file.stat().st_mtime)
+            for file in files[:max(0, len(files) - self.max_files)]:
+                file.unlink(missing_ok=True)
+        except OSError as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error pruning speech cache: {e}")
@@ -0,0 +1,158 @@
+"""
+Check which captured phrases the voice pipeline answers
+Drives the pipeline with a scripted microphone and speaker, so no audio
+devices or models are needed
+"""
+
+import asyncio
+import sys
+import time
+import config
+from pipeline import VoicePipeline
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+PLAYBACK_SECONDS = 0.5
+PHRASE_SECONDS = 0.1
+
+
+class ScriptedAudio:
+    """A captured phrase with its transcript and when it was spoken"""
+
+    def __init__(self, text: str):
+        self.text = text
+        now = time.monotonic()
+        self.times = (now - PHRASE_SECONDS, now)
+
+
+class ScriptedInput:
+    """Stands in for VoiceInput, returning phrases after set delays"""
+
+    def __init__(self, script, wake_words=()):
+        """
+        Args:
+            script: (seconds to wait, transcript) per capture, in order; a
+                phrase with no wait is already recorded, so skip_buffered()
+                discards it
+            wake_words: Results of successive wake word spotting calls
+        """
+        self.script = list(script)
+        self.wake_words = list(wake_words)
+        self.spotter = object() if self.wake_words else None
+
+    def capture(self, prompt=None, report_timeout=True, on_partial=None):
+        if not self.script:
+            time.sleep(0.1)
+            return None
+        delay, text = self.script.pop(0)
+        time.sleep(delay)
+        return ScriptedAudio(text)
+
+    def spot_wake_word(self):
+        if not self.wake_words:
+            time.sleep(0.1)
+            return False
+        return self.wake_words.pop(0)
+
+    def phrase_times(self, audio):
+        return audio.times
+
+    def recognize(self, audio):
+        return audio.text
+
+    def skip_buffered(self):
+        while self.script and self.script[0][0] == 0:
+            self.script.pop(0)
+
+
+class ScriptedOutput:
+    """Stands in for VoiceOutput; each reply takes a fixed time to play"""
+
+    def __init__(self):
+        self.speaking = False
+
+    def speak_stream(self, pieces):
+        self.speaking = True
+        try:
+            for _ in pieces:
+                pass
+            time.sleep(PLAYBACK_SECONDS)
+        finally:
+            self.speaking = False
+
+    def is_speaking(self):
+        return self.speaking
+
+    def stop(self):
+        pass
+
+
+def run_pipeline(script, wake_words=()):
+    """Run the pipeline over a script, returning the texts it answered"""
+    answered = []
+
+    def respond(text):
+        answered.append(text)
+        yield f"Reply to {text}."
+
+    pipeline = VoicePipeline(ScriptedInput(script, wake_words), ScriptedOutput(), respond,
+                             barge_in=False)
+    try:
+        asyncio.run(asyncio.wait_for(pipeline.run(), timeout=10))
+    except asyncio.TimeoutError:
+        print(f"{Fore.RED}Pipeline did not reach goodbye")
+    return answered
+
+
+def check(name: str, answered, expected) -> bool:
+    """Print and compare the answered texts"""
+    if answered == expected:
+        print(f"{Fore.GREEN}{name}: answered {answered}")
+        return True
+    print(f"{Fore.RED}{name}: answered {answered}, expected {expected}")
+    return False
+
+
+def test_playback_overlap():
+    """Phrases starting during a reply are dropped, later ones are kept"""
+    print(f"{Fore.CYAN}{Style.BRIGHT}=== Voice Pipeline Test ==={Style.RESET_ALL}")
+
+    wake_word = config.ENABLE_WAKE_WORD
+    config.ENABLE_WAKE_WORD = False
+    try:
+        answered = run_pipeline([
+            (0, "hello"),
+            # Capture starts before the reply plays; the phrase begins after it ends
+            (PLAYBACK_SECONDS + 1, "what time is it"),
+            # Begins while the reply to the previous phrase is playing
+            (PLAYBACK_SECONDS / 2, "echo of the reply"),
+            (PLAYBACK_SECONDS, "goodbye"),
+        ])
+    finally:
+        config.ENABLE_WAKE_WORD = wake_word
+
+    return check("Playback overlap", answered, ["hello", "what time is it", "goodbye"])
+
+
+def test_wake_word_command():
+    """A command in the same breath as the wake word survives the "Yes?" prompt"""
+    settings = (config.ENABLE_WAKE_WORD, config.ENABLE_VOICE_FEEDBACK)
+    config.ENABLE_WAKE_WORD = True
+    config.ENABLE_VOICE_FEEDBACK = True
+    try:
+        answered = run_pipeline([
+            # Already recorded when the wake word is spotted
+            (0, "what time is it"),
+            # Said after the "Yes?" for the second wake word
+            (PLAYBACK_SECONDS * 3, "goodbye"),
+        ], wake_words=[True, True])
+    finally:
+        config.ENABLE_WAKE_WORD, config.ENABLE_VOICE_FEEDBACK = settings
+
+    return check("Wake word command", answered, ["what time is it", "goodbye"])
+
+
+if __name__ == "__main__":
+    results = [test_playback_overlap(), test_wake_word_command()]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,126 @@
+"""
+Check that int8 quantization keeps response quality acceptable
+Compares the quantized model against the float model on sample prompts
+"""
+
+import io
+import sys
+import time
+import torch
+from ai_agent import AIAgent
+from colorama import Fore, Style, init
+
+init(autoreset=True)
+
+# Acceptance thresholds for the int8 model
+MAX_PERPLEXITY_INCREASE = 0.15  # Relative to the float model
+MIN_TOKEN_AGREEMENT = 0.85  # Fraction of matching greedy next-token predictions
+REFERENCE_TOKENS = 32  # Length of the float model's reference replies
+
+SAMPLE_PROMPTS = [
+    "Hello, how are you?",
+    "What can you do for me?",
+    "Tell me something interesting",
+    "What's your favorite color?",
+    "Can you suggest a productive morning routine?",
+]
+
+
+def model_size_mb(model) -> float:
+    """Serialized size of the model's weights"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def score_reference(agent, prompt_ids, reply_ids):
+    """
+    Teacher-force a reference reply through a model
+
+    Returns:
+        Summed negative log-likelihood of the reply and the model's greedy
+        prediction at each reply position
+    """
+    input_ids = torch.cat([prompt_ids, reply_ids], dim=-1)
+    with torch.no_grad():
+        logits = agent.model(input_ids).logits[0, prompt_ids.shape[-1] - 1:-1]
+    log_probs = torch.log_softmax(logits.float(), dim=-1)
+    nll = -log_probs.gather(-1, reply_ids[0].unsqueeze(-1)).sum().item()
+    return nll, logits.argmax(dim=-1)
+
+
+def test_quantization():
+    """Compare float and int8 models on the sample prompts"""
+    print(f"{Fore.CYAN}{Style.BRIGHT}=== Quantization Quality Test ==={Style.RESET_ALL}")
+
+    try:
+        float_agent = AIAgent(quantize=False)
+        int8_agent = AIAgent(quantize=True)
+    except Exception as e:
+        print(f"{Fore.RED}Error initializing agents: {e}")
+        return False
+
+    if not int8_agent.quantized:
+        print(f"{Fore.YELLOW}Quantization is CPU-only; nothing to compare on {int8_agent.device}")
+        return True
+
+    float_nll = int8_nll = 0.0
+    matches = total = 0
+    float_time = int8_time = 0.0
+
+    for prompt in SAMPLE_PROMPTS:
+        prompt_ids = float_agent.tokenizer.encode(
+            prompt + float_agent.tokenizer.eos_token, return_tensors="pt"
+        )
+
+        # Greedy float reply is the reference both models are scored on
+        generation_kwargs = dict(
+            max_new_tokens=REFERENCE_TOKENS,
+            min_new_tokens=REFERENCE_TOKENS,
+            do_sample=False,
+            pad_token_id=float_agent.tokenizer.pad_token_id,
+        )
+        with torch.no_grad():
+            start = time.perf_counter()
+            reference = float_agent.model.generate(prompt_ids, **generation_kwargs)
+            float_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            int8_agent.model.generate(prompt_ids, **generation_kwargs)
+            int8_time += time.perf_counter() - start
+
+        reply_ids = reference[:, prompt_ids.shape[-1]:]
+        nll, float_predictions = score_reference(float_agent, prompt_ids, reply_ids)
+        float_nll += nll
+        nll, int8_predictions = score_reference(int8_agent, prompt_ids, reply_ids)
+        int8_nll += nll
+
+        matches += (float_predictions == int8_predictions).sum().item()
+        total += reply_ids.shape[-1]
+
+        print(f"{Fore.BLUE}User: {prompt}")
+        print(f"{Fore.GREEN}Float: {float_agent.tokenizer.decode(reply_ids[0], skip_special_tokens=True)}")
+
+    float_ppl = torch.exp(torch.tensor(float_nll / total)).item()
+    int8_ppl = torch.exp(torch.tensor(int8_nll / total)).item()
+    increase = int8_ppl / float_ppl - 1
+    agreement = matches / total
+
+    print(f"\n{Fore.CYAN}Model: {float_agent.model_name}")
+    print(f"  Size:       {model_size_mb(float_agent.model):.0f} MB -> {model_size_mb(int8_agent.model):.0f} MB")
+    print(f"  Speed:      {total / float_time:.1f} -> {total / int8_time:.1f} tokens/sec")
+    print(f"  Perplexity: {float_ppl:.2f} -> {int8_ppl:.2f} ({increase:+.1%})")
+    print(f"  Agreement:  {agreement:.1%} of greedy next-token predictions")
+
+    passed = increase <= MAX_PERPLEXITY_INCREASE and agreement >= MIN_TOKEN_AGREEMENT
+    if passed:
+        print(f"\n{Fore.GREEN}{Style.BRIGHT}int8 response quality is acceptable{Style.RESET_ALL}")
+    else:
+        print(f"\n{Fore.RED}{Style.BRIGHT}int8 response quality degraded too much{Style.RESET_ALL}")
+        print(f"{Fore.RED}  Limits: perplexity +{MAX_PERPLEXITY_INCREASE:.0%}, agreement {MIN_TOKEN_AGREEMENT:.0%}")
+    return passed
+
+
+if __name__ == "__main__":
+    success = test_quantization()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,200 @@
+"""
+Voice Activity Detection Module
+Finds speech in raw microphone audio using frame energy and zero crossings
+"""
+
+import math
+from collections import deque
+from typing import Callable, List, Optional
+import numpy as np
+import config
+
+
+class VoiceActivityDetector:
+    """
+    Frame-level speech/non-speech classifier for 16-bit mono PCM
+
+    A frame is speech when its energy is threshold_db above the noise floor.
+    Quieter frames still count when they cross zero often, which catches
+    unvoiced sounds such as "s" and "f" at the edges of words. The noise
+    floor follows the energy of non-speech frames, so it adapts to the room.
+    """
+
+    def __init__(self, sample_rate: int, frame_ms: int = config.VAD_FRAME_MS,
+                 threshold_db: float = config.VAD_THRESHOLD_DB,
+                 zcr_threshold: float = config.VAD_ZCR_THRESHOLD):
+        """
+        Args:
+            sample_rate: Sample rate of the audio in Hz
+            frame_ms: Length of each analysis frame
+            threshold_db: How far above the noise floor speech must be
+            zcr_threshold: Zero-crossing rate that marks quieter frames as speech
+        """
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_length = max(1, sample_rate * frame_ms // 1000)
+        self.frame_bytes = self.frame_length * 2
+        self.threshold_db = threshold_db
+        self.zcr_threshold = zcr_threshold
+        self.noise_floor_db = None
+
+    def frame_features(self, pcm: bytes):
+        """
+        Energy (dB) and zero-crossing rate of each whole frame in pcm
+
+        Returns:
+            Two arrays with one value per frame
+        """
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        count = len(samples) // self.frame_length
+        frames = samples[:count * self.frame_length].reshape(count, self.frame_length)
+        frames = frames.astype(np.float32)
+
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1.0)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+        return energy_db, zcr
+
+    def calibrate(self, pcm: bytes):
+        """Set the noise floor from audio known to contain no speech"""
+        energy_db, _ = self.frame_features(pcm)
+        if len(energy_db):
+            self.noise_floor_db = float(np.median(energy_db))
+
+    def classify(self, pcm: bytes) -> np.ndarray:
+        """
+        Classify each whole frame in pcm as speech or not
+
+        Returns:
+            Boolean array with one value per frame
+        """
+        energy_db, zcr = self.frame_features(pcm)
+        if not len(energy_db):
+            return np.zeros(0, dtype=bool)
+
+        if self.noise_floor_db is None:
+            # Without calibration the quietest frame is taken as background
+            self.noise_floor_db = float(energy_db.min())
+
+        above = energy_db - self.noise_floor_db
+        speech = (above >= self.threshold_db) | (
+            (above >= self.threshold_db / 2) & (zcr >= self.zcr_threshold)
+        )
+
+        # Track the floor: drop at once to quieter audio, rise slowly with
+        # louder background so speech does not drag it up
+        quiet = energy_db[~speech]
+        if len(quiet):
+            self.noise_floor_db = min(
+                float(quiet.min()),
+                self.noise_floor_db + 0.05 * (float(quiet.mean()) - self.noise_floor_db),
+            )
+        return speech
+
+
+class SpeechSegmenter:
+    """
+    Cuts a PCM stream into speech segments
+
+    A segment starts after start_ms of speech and ends after end_ms of
+    silence. padding_ms of audio is kept on each side so word edges are not
+    clipped; the rest of the silence never reaches the recognizer.
+    """
+
+    def __init__(self, detector: VoiceActivityDetector,
+                 start_ms: int = config.VAD_START_MS,
+                 end_ms: int = config.VAD_END_MS,
+                 padding_ms: int = config.VAD_PADDING_MS,
+                 max_ms: int = config.VAD_MAX_SEGMENT_MS,
+                 on_audio: Optional[Callable[[bytes], None]] = None):
+        """
+        Args:
+            detector: Classifier used for each frame
+            start_ms: Speech needed before a segment starts
+            end_ms: Silence needed before a segment ends
+            padding_ms: Audio kept before and after the speech
+            max_ms: Longest segment; longer speech is cut here
+            on_audio: Called with the audio of the current segment as it
+                is added, e.g. to decode speech while it is being recorded
+        """
+        frame_ms = detector.frame_ms
+        self.detector = detector
+        self.start_frames = max(1, math.ceil(start_ms / frame_ms))
+        self.end_frames = max(1, math.ceil(end_ms / frame_ms))
+        self.padding_frames = math.ceil(padding_ms / frame_ms)
+        self.max_frames = max(1, max_ms // frame_ms)
+        self.on_audio = on_audio
+
+        self._remainder = b""  # Partial frame carried into the next feed
+        self._preroll = deque(maxlen=self.padding_frames + self.start_frames)
+        self._segment: List[bytes] = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.in_speech = False
+
+    def feed(self, pcm: bytes) -> List[bytes]:
+        """
+        Add audio to the stream
+
+        Args:
+            pcm: 16-bit mono PCM in any chunk size
+
+        Returns:
+            Segments completed by this audio (usually none or one)
+        """
+        frame_bytes = self.detector.frame_bytes
+        data = self._remainder + pcm
+        usable = len(data) - len(data) % frame_bytes
+        self._remainder = data[usable:]
+
+        view = memoryview(data)
+        segments = []
+        for index, speech in enumerate(self.detector.classify(view[:usable])):
+            frame = view[index * frame_bytes:(index + 1) * frame_bytes]
+
+            if not self.in_speech:
+                self._preroll.append(frame)
+                self._speech_run = self._speech_run + 1 if speech else 0
+                if self._speech_run >= self.start_frames:
+                    self.in_speech = True
+                    self._segment = list(self._preroll)
+                    self._preroll.clear()
+                    self._silence_run = 0
+                    if self.on_audio:
+                        self.on_audio(b"".join(self._segment))
+                continue
+
+            self._segment.append(frame)
+            if self.on_audio:
+                self.on_audio(frame)
+            self._silence_run = 0 if speech else self._silence_run + 1
+            if self._silence_run >= self.end_frames or len(self._segment) >= self.max_frames:
+                segments.append(self.flush())
+
+        return segments
+
+    def flush(self) -> bytes:
+        """
+        End the current segment now
+
+        Returns:
+            The segment with trailing silence trimmed to the padding, or
+            empty bytes if no speech was in progress
+        """
+        frames = self._segment
+        excess = self._silence_run - self.padding_frames
+        if excess > 0:
+            frames = frames[:-excess]
+        segment = b"".join(frames) if self.in_speech else b""
+
+        self._segment = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.in_speech = False
+        return segment
+
+    def reset(self):
+        """Discard all buffered audio"""
+        self.flush()
+        self._preroll.clear()
+        self._remainder = b""
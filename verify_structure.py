@@ -4,6 +4,7 @@ This test checks functionality without downloading large AI models
 """
 
 import sys
+import importlib.util
 from colorama import Fore, Style, init
 import config
 
@@ -59,11 +60,17 @@ def test_basic_structure():
         print(f"{Fore.RED}✗ Voice output module failed: {e}")
     
     # Test 4: AI Agent module
+    # ai_agent loads torch and transformers, so it is compiled, not executed
     tests_total += 1
     print(f"\n{Fore.CYAN}Test 4: AI Agent module")
     try:
-        import ai_agent
-        print(f"{Fore.GREEN}✓ AI agent module loads")
+        spec = importlib.util.find_spec("ai_agent")
+        spec.loader.get_code("ai_agent")
+        print(f"{Fore.GREEN}✓ AI agent module compiles")
+        if importlib.util.find_spec("torch") and importlib.util.find_spec("transformers"):
+            print(f"{Fore.GREEN}  torch and transformers available")
+        else:
+            print(f"{Fore.YELLOW}  torch/transformers not installed (needed to run the agent)")
         tests_passed += 1
     except Exception as e:
         print(f"{Fore.RED}✗ AI agent module failed: {e}")
@@ -3,8 +3,11 @@ Speech Recognition Module
 Handles voice input from the user
 """
 
-from typing import Optional
+import time
+import weakref
+from typing import Callable, Optional, Tuple
 import config
+import metrics
 from colorama import Fore, Style, init
 
 init(autoreset=True)
@@ -16,6 +19,41 @@ except ImportError:
     SPEECH_RECOGNITION_AVAILABLE = False
     sr = None
 
+try:
+    from vad import VoiceActivityDetector, SpeechSegmenter
+    VAD_AVAILABLE = True
+except ImportError:
+    VAD_AVAILABLE = False
+
+from audio_capture import AudioCapture
+from recognizers import VoskRecognizer, create_recognizer
+
+
+class _BufferedSource(sr.AudioSource if SPEECH_RECOGNITION_AVAILABLE else object):
+    """
+    speech_recognition audio source that reads from the capture buffer
+    
+    Lets recognizer.listen and adjust_for_ambient_noise use the always-open
+    microphone through VoiceInput's cursor.
+    """
+    
+    def __init__(self, audio: AudioCapture, reader):
+        self.SAMPLE_RATE = audio.sample_rate
+        self.SAMPLE_WIDTH = audio.sample_width
+        self.CHUNK = audio.chunk
+        self.reader = reader
+        self.stream = self
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+    
+    def read(self, size: int) -> bytes:
+        """Read size samples, like a PyAudio stream"""
+        return self.reader.read_exact(size * self.SAMPLE_WIDTH)
+
 
 class VoiceInput:
     """Handles speech-to-text conversion"""
@@ -30,16 +68,56 @@ class VoiceInput:
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         
+        # The microphone stays open; wake word spotting, VAD and recognition
+        # all read the same recording through one cursor
+        self.audio = AudioCapture(self.microphone)
+        self._reader = self.audio.reader()
+        self.source = _BufferedSource(self.audio, self._reader)
+        
         # Configure recognizer
         self.recognizer.energy_threshold = config.ENERGY_THRESHOLD
         self.recognizer.pause_threshold = config.PAUSE_THRESHOLD
         self.recognizer.dynamic_energy_threshold = True
+        self.vad = None
+        
+        try:
+            self.backend = create_recognizer(config.RECOGNIZER_BACKEND, self.recognizer)
+        except (ImportError, OSError) as e:
+            print(f"{Fore.YELLOW}{e}")
+            print(f"{Fore.YELLOW}Falling back to Google speech recognition")
+            self.backend = create_recognizer("google", self.recognizer)
+        
+        # Transcripts decoded while capturing, picked up by recognize()
+        self._transcripts = weakref.WeakKeyDictionary()
+        # When each captured phrase was spoken, see phrase_times()
+        self._phrase_times = weakref.WeakKeyDictionary()
         
         # Adjust for ambient noise
         print(f"{Fore.YELLOW}Calibrating microphone for ambient noise...")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+        if config.ENABLE_VAD and VAD_AVAILABLE and self.audio.sample_width == 2:
+            self.vad = VoiceActivityDetector(self.audio.sample_rate)
+            self.vad.calibrate(self._reader.read_exact(self.audio.bytes_for(1000)))
+        else:
+            self.recognizer.adjust_for_ambient_noise(self.source, duration=1)
         print(f"{Fore.GREEN}Microphone calibrated!")
+        
+        self.spotter = None
+        if config.ENABLE_WAKE_WORD and config.ENABLE_WAKE_WORD_SPOTTER:
+            self._init_spotter()
+    
+    def _init_spotter(self):
+        """Initialize the local wake word spotter, if vosk is available"""
+        try:
+            from wake_word import WakeWordSpotter
+            
+            # Share the recognizer's model rather than loading a second copy
+            model = self.backend.model if isinstance(self.backend, VoskRecognizer) else None
+            self.spotter = WakeWordSpotter(
+                self.audio.sample_rate, detector=self.vad, model=model
+            )
+        except (ImportError, OSError) as e:
+            print(f"{Fore.YELLOW}Wake word spotter not available ({e})")
+            print(f"{Fore.YELLOW}The wake word will be found by full speech recognition")
     
     def listen(self, prompt: str = "Listening...") -> Optional[str]:
         """
@@ -51,29 +129,154 @@ class VoiceInput:
         Returns:
             Transcribed text or None if recognition failed
         """
+        audio = self.capture(prompt)
+        if audio is None:
+            return None
+        return self.recognize(audio)
+    
+    def capture(self, prompt: Optional[str] = "Listening...",
+                report_timeout: bool = True,
+                on_partial: Optional[Callable[[str], None]] = None) -> Optional["sr.AudioData"]:
+        """
+        Record one phrase from the microphone
+        
+        With voice activity detection and a streaming recognizer backend,
+        the phrase is decoded while it is recorded.
+        
+        Args:
+            prompt: Message to display while listening (None for no message)
+            report_timeout: Whether to print a message when nobody speaks
+            on_partial: Called with partial transcripts while decoding
+            
+        Returns:
+            Recorded audio or None if no speech was detected
+        """
         try:
-            with self.microphone as source:
+            if prompt:
                 print(f"{Fore.CYAN}{prompt}")
-                audio = self.recognizer.listen(source, timeout=10, phrase_time_limit=15)
+            self._catch_up()
+            start = time.perf_counter()
+            if self.vad is not None:
+                audio = self._capture_segment(timeout=10, on_partial=on_partial)
+            else:
+                audio = self.recognizer.listen(self.source, timeout=10, phrase_time_limit=15)
+            # Includes waiting for the speaker to start
+            metrics.LISTEN_SECONDS.observe(time.perf_counter() - start, stage="capture")
+            self._phrase_times[audio] = self._recorded_times(audio)
+            return audio
             
-            print(f"{Fore.YELLOW}Processing speech...")
+        except sr.WaitTimeoutError:
+            if report_timeout:
+                print(f"{Fore.RED}No speech detected. Timeout.")
+            return None
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error capturing audio: {e}")
+            return None
+    
+    def _capture_segment(self, timeout: float,
+                         on_partial: Optional[Callable[[str], None]] = None) -> "sr.AudioData":
+        """
+        Record one phrase, endpointed by the voice activity detector
+        
+        Args:
+            timeout: Seconds to wait for speech to start
+            on_partial: Called with partial transcripts while decoding
             
-            # Use Google Speech Recognition (free, no API key needed)
-            text = self.recognizer.recognize_google(
-                audio, 
-                language=config.SPEECH_RECOGNITION_LANGUAGE
-            )
+        Returns:
+            The speech with only a little silence around it
+        """
+        stream = None
+        if self.backend.streaming:
+            stream = self.backend.start_stream(self.audio.sample_rate)
+        
+        def decode(pcm: bytes):
+            partial = stream.accept(pcm)
+            if partial and on_partial:
+                on_partial(partial)
+        
+        segmenter = SpeechSegmenter(self.vad, on_audio=decode if stream else None)
+        deadline = time.monotonic() + timeout
+        
+        while True:
+            buffer = self._reader.read(timeout=0.1)
+            if len(buffer):
+                segments = segmenter.feed(buffer)
+                if segments:
+                    segment = segments[0]
+                    break
+            elif self.audio.closed:
+                segment = segmenter.flush()
+                break
+            
+            if not segmenter.in_speech and time.monotonic() > deadline:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+        
+        if not segment:
+            raise sr.WaitTimeoutError("audio stream ended before a phrase was heard")
+        
+        audio = sr.AudioData(segment, self.audio.sample_rate, self.audio.sample_width)
+        if stream:
+            # Only the end of the phrase is left to decode
+            with metrics.LISTEN_SECONDS.time(stage="recognize"):
+                self._transcripts[audio] = stream.finish()
+        return audio
+    
+    def _recorded_times(self, audio: "sr.AudioData") -> Tuple[float, float]:
+        """Estimate when a phrase ending at the reader's cursor was spoken"""
+        behind = self.audio.ring.position - self._reader.position
+        end = time.monotonic() - behind / self.audio.bytes_for(1000)
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        return end - duration, end
+    
+    def phrase_times(self, audio: "sr.AudioData") -> Optional[Tuple[float, float]]:
+        """
+        When a captured phrase was spoken
+        
+        Args:
+            audio: Audio returned by capture()
+            
+        Returns:
+            Start and end as time.monotonic() values, or None if unknown
+        """
+        return self._phrase_times.get(audio)
+    
+    def skip_buffered(self):
+        """Skip everything recorded so far, e.g. the assistant's own voice"""
+        self._reader.skip_to(self.audio.ring.position)
+    
+    def _catch_up(self):
+        """Skip audio nobody listened to, e.g. while the assistant was talking"""
+        max_lag = self.audio.bytes_for(config.CAPTURE_MAX_LAG_MS)
+        if self._reader.lag() > max_lag:
+            self._reader.skip_to(self.audio.ring.position - max_lag)
+    
+    def recognize(self, audio: "sr.AudioData") -> Optional[str]:
+        """
+        Convert recorded audio to text
+        
+        Args:
+            audio: Audio returned by capture()
+            
+        Returns:
+            Transcribed text or None if recognition failed
+        """
+        try:
+            # Streaming backends have already decoded the phrase
+            text = self._transcripts.pop(audio, None)
+            if text is None:
+                print(f"{Fore.YELLOW}Processing speech...")
+                with metrics.LISTEN_SECONDS.time(stage="recognize"):
+                    text = self.backend.transcribe(audio)
+            
+            if not text:
+                print(f"{Fore.RED}Could not understand audio.")
+                return None
             
             # Return original text (case preserved for proper nouns)
             # Command processing will handle case normalization if needed
             return text
             
-        except sr.WaitTimeoutError:
-            print(f"{Fore.RED}No speech detected. Timeout.")
-            return None
-        except sr.UnknownValueError:
-            print(f"{Fore.RED}Could not understand audio.")
-            return None
         except sr.RequestError as e:
             print(f"{Fore.RED}Speech recognition service error: {e}")
             return None
@@ -82,6 +285,39 @@ class VoiceInput:
                 print(f"{Fore.RED}Error in speech recognition: {e}")
             return None
     
+    def spot_wake_word(self, timeout: float = 10) -> bool:
+        """
+        Listen for the wake word with the local spotter
+        
+        Only the spotter sees this audio; nothing is sent to the recognizer.
+        
+        Args:
+            timeout: Seconds to listen before giving up
+            
+        Returns:
+            True as soon as the wake word is heard, False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        self._catch_up()
+        try:
+            while time.monotonic() < deadline:
+                chunk = self._reader.read(timeout=0.1)
+                if not len(chunk):
+                    if self.audio.closed:
+                        break
+                    continue
+                
+                if self.spotter.feed(chunk):
+                    # The spotter reports a little after the wake word ends;
+                    # re-read that audio so a command in the same breath is kept
+                    rewind = self.audio.bytes_for(config.WAKE_WORD_REWIND_MS)
+                    self._reader.skip_to(self._reader.position - rewind)
+                    return True
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error spotting wake word: {e}")
+        return False
+    
     def wait_for_wake_word(self) -> bool:
         """
         Wait for the wake word to be spoken
@@ -91,6 +327,12 @@ class VoiceInput:
         """
         print(f"{Fore.MAGENTA}Say '{config.WAKE_WORD}' to activate...")
         
+        if self.spotter is not None:
+            if self.spot_wake_word():
+                print(f"{Fore.GREEN}Wake word detected!")
+                return True
+            return False
+        
         text = self.listen(prompt=f"{Fore.CYAN}Waiting for wake word...")
         
         # Check for wake word (case-insensitive)
@@ -122,3 +364,7 @@ class VoiceInput:
                     
         except KeyboardInterrupt:
             print(f"\n{Fore.YELLOW}Stopping listening mode...")
+    
+    def close(self):
+        """Stop recording and release the microphone"""
+        self.audio.close()
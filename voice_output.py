@@ -3,8 +3,15 @@ Text-to-Speech Module
 Handles voice output to the user
 """
 
-from typing import Optional
+import re
+import io
+import queue
+from threading import Event, Lock, Thread
+from typing import Iterable, Iterator, List, Optional
 import config
+import metrics
+from audio_playback import AudioPlayer, Clip, decode_audio
+from speech_cache import SpeechCache
 from colorama import Fore, Style, init
 
 init(autoreset=True)
@@ -16,20 +23,123 @@ except ImportError:
     PYTTSX3_AVAILABLE = False
     pyttsx3 = None
 
+try:
+    from gtts import gTTS
+    GTTS_AVAILABLE = True
+except ImportError:
+    GTTS_AVAILABLE = False
+    gTTS = None
+
+
+# Sentence ends need trailing whitespace, so "3.5" or "e.g." mid-stream don't split
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+_CLAUSE_END = re.compile(r'[,;:]\s+')
+
+
+def split_sentences(pieces: Iterable[str],
+                    min_clause_chars: int = config.TTS_MIN_CLAUSE_CHARS) -> Iterator[str]:
+    """
+    Regroup streamed text into speakable chunks
+    
+    Chunks end at sentence boundaries, or at a clause boundary (comma,
+    semicolon, colon) once at least min_clause_chars have accumulated, so
+    long sentences start playing early without choppy one-word chunks.
+    
+    Args:
+        pieces: Text fragments in order (e.g. from AIAgent.stream_response)
+        min_clause_chars: Minimum chunk length before splitting at a clause
+        
+    Yields:
+        Non-empty chunks of text
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        while True:
+            match = _SENTENCE_END.search(buffer)
+            if match is None:
+                match = _CLAUSE_END.search(buffer, min_clause_chars)
+            if match is None:
+                break
+            
+            chunk, buffer = buffer[:match.end()].strip(), buffer[match.end():]
+            if chunk:
+                yield chunk
+    
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class Utterance:
+    """A piece of speech queued for playback, which can be cancelled"""
+    
+    def __init__(self, text: str, audio: Optional[Clip] = None):
+        """
+        Args:
+            text: Text to speak
+            audio: Audio already synthesized for the text, if any
+        """
+        self.text = text
+        self.audio = audio
+        self._cancelled = Event()
+        self._done = Event()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancel() was called"""
+        return self._cancelled.is_set()
+    
+    def cancel(self):
+        """Skip this utterance, or cut it short if it is playing"""
+        self._cancelled.set()
+    
+    def done(self) -> bool:
+        """Whether the utterance has finished playing (or was skipped)"""
+        return self._done.is_set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the utterance is done; returns False on timeout"""
+        return self._done.wait(timeout)
+
 
 class VoiceOutput:
-    """Handles text-to-speech conversion"""
+    """
+    Handles text-to-speech conversion
+    
+    Speech plays on a dedicated playback thread, which also owns the pyttsx3
+    engine. speak_async queues an utterance and returns at once; speak waits
+    for it. stop() cancels everything queued or playing.
+    """
     
     def __init__(self, engine_type: str = config.TTS_ENGINE):
+        if engine_type not in ("pyttsx3", "gtts"):
+            raise ValueError(f"Unknown TTS engine: {engine_type}")
+        
         self.engine_type = engine_type
         self.engine = None  # Initialize to None for all engine types
+        # Voice, rate and volume for speech cache keys; the pyttsx3 engine's
+        # are read once on the playback thread, which owns the engine
+        self._voice_settings = ("en", "normal", config.TTS_VOLUME)
         
-        if engine_type == "pyttsx3":
-            self._init_pyttsx3()
-        elif engine_type == "gtts":
+        if engine_type == "gtts":
             print(f"{Fore.YELLOW}gTTS engine selected (requires internet)")
-        else:
-            raise ValueError(f"Unknown TTS engine: {engine_type}")
+        
+        # Synthesized audio plays on one output stream that stays open
+        self.player = AudioPlayer()
+        self.cache = SpeechCache() if config.ENABLE_SPEECH_CACHE else None
+        
+        self._queue = queue.Queue()
+        metrics.QUEUE_DEPTH.set_function(self._queue.qsize, queue="playback")
+        self._pending: List[Utterance] = []  # Queued, not yet playing
+        self._current: Optional[Utterance] = None
+        self._lock = Lock()
+        self._stops = 0  # Incremented by stop(), so speak_stream notices
+        
+        ready = Event()
+        self._worker = Thread(target=self._playback_loop, args=(ready,),
+                              name="tts-playback", daemon=True)
+        self._worker.start()
+        ready.wait()
     
     def _init_pyttsx3(self):
         """Initialize pyttsx3 engine"""
@@ -52,6 +162,12 @@ class VoiceOutput:
                 voice_index = 1 if len(voices) > 1 else 0
                 self.engine.setProperty('voice', voices[voice_index].id)
             
+            self._voice_settings = (
+                self.engine.getProperty('voice'),
+                self.engine.getProperty('rate'),
+                self.engine.getProperty('volume'),
+            )
+            
             print(f"{Fore.GREEN}Text-to-speech engine initialized!")
             
         except Exception as e:
@@ -61,19 +177,267 @@ class VoiceOutput:
     
     def speak(self, text: str, display: bool = True):
         """
-        Convert text to speech and play it
+        Convert text to speech and play it, waiting until it has been spoken
         
         Args:
             text: Text to speak
             display: Whether to print the text to console
         """
+        self.speak_async(text, display).wait()
+    
+    def speak_async(self, text: str, display: bool = True) -> Utterance:
+        """
+        Queue text to be spoken and return immediately
+        
+        Args:
+            text: Text to speak
+            display: Whether to print the text to console
+            
+        Returns:
+            The queued utterance, which can be waited on or cancelled
+        """
         if display:
             print(f"{Fore.GREEN}Agent: {Style.BRIGHT}{text}")
+        return self._enqueue(Utterance(text))
+    
+    def prerender(self, phrases: Iterable[str]):
+        """
+        Synthesize phrases into the speech cache ahead of time
+        
+        Phrases are split into chunks the same way speak_stream splits
+        replies, so streamed text that matches them is cached too.
+        Rendering runs on the playback thread, which owns the TTS engine.
+        
+        Args:
+            phrases: Fixed phrases the assistant says often
+        """
+        if self.cache is None:
+            return
+        
+        chunks = [chunk for phrase in phrases for chunk in split_sentences([phrase])]
+        finished = Event()
+        
+        def render():
+            for chunk in chunks:
+                self._cached_audio(chunk)
+            finished.set()
+        
+        self._queue.put(render)
+        finished.wait()
+    
+    def speak_stream(self, pieces: Iterable[str], display: bool = False) -> str:
+        """
+        Speak text while it is still being produced, one chunk at a time
+        
+        The text is split at sentence or clause boundaries. Chunks are
+        synthesized on the calling thread and queued for playback, at most
+        TTS_PREFETCH_CHUNKS ahead of the one playing, so speech starts after
+        the first sentence and plays without gaps.
+        
+        Args:
+            pieces: Text fragments in order (e.g. from AIAgent.stream_response)
+            display: Whether to print the text to console as it arrives
+            
+        Returns:
+            The complete text
+        """
+        received: List[str] = []
+        
+        def collect():
+            if display:
+                print(f"{Fore.GREEN}Agent: ", end="", flush=True)
+            for piece in pieces:
+                received.append(piece)
+                if display:
+                    print(f"{Fore.GREEN}{Style.BRIGHT}{piece}", end="", flush=True)
+                yield piece
+            if display:
+                print()
+        
+        stops = self._stops
+        queued: List[Utterance] = []
+        try:
+            for chunk in split_sentences(collect()):
+                if len(queued) > config.TTS_PREFETCH_CHUNKS:
+                    queued[-config.TTS_PREFETCH_CHUNKS - 1].wait()
+                if self._stops != stops:
+                    break
+                
+                # pyttsx3 can only render on the playback thread, so here
+                # it just looks in the cache
+                audio = self._prepare(chunk, render=self.engine_type == "gtts")
+                if self._stops != stops:
+                    break
+                queued.append(self._enqueue(Utterance(chunk, audio)))
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error preparing speech: {e}")
         
+        if queued:
+            queued[-1].wait()
+        return "".join(received)
+    
+    def _enqueue(self, utterance: Utterance) -> Utterance:
+        """Queue an utterance for the playback thread"""
+        with self._lock:
+            self._pending.append(utterance)
+        self._queue.put(utterance)
+        return utterance
+    
+    def _playback_loop(self, ready: Event):
+        """Play queued utterances in order (runs on the playback thread)"""
         if self.engine_type == "pyttsx3":
-            self._speak_pyttsx3(text)
-        elif self.engine_type == "gtts":
-            self._speak_gtts(text)
+            self._init_pyttsx3()
+        ready.set()
+        
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if callable(item):
+                item()
+                continue
+            
+            with self._lock:
+                if item in self._pending:
+                    self._pending.remove(item)
+                self._current = item
+            try:
+                if not item.cancelled:
+                    audio = item.audio
+                    if audio is None:
+                        audio = self._prepare(item.text, render=self.engine_type == "gtts")
+                    if not item.cancelled:
+                        self._play(item.text, audio, item)
+            except Exception as e:
+                if config.DEBUG:
+                    print(f"{Fore.RED}Error speaking: {e}")
+            finally:
+                with self._lock:
+                    self._current = None
+                item._done.set()
+    
+    def _prepare(self, text: str, render: bool = True):
+        """
+        Do the part of speaking a chunk that can run ahead of playback
+        
+        Args:
+            text: Chunk to speak
+            render: Whether to synthesize audio that is not cached
+            
+        Returns:
+            Decoded audio, or None when pyttsx3 is to synthesize while
+            playing (without the cache)
+        """
+        with metrics.SPEAK_SECONDS.time(stage="synthesize"):
+            if self.cache is not None:
+                audio = self._cached_audio(text, render)
+                if audio is not None:
+                    return audio
+            
+            if self.engine_type == "gtts" and render:
+                return self._synthesize_gtts(text)
+            return None
+    
+    def _play(self, text: str, audio: Optional[Clip], utterance: Utterance):
+        """Play a chunk prepared by _prepare"""
+        if audio is not None:
+            with metrics.SPEAK_SECONDS.time(stage="play"):
+                self._play_audio(audio, utterance)
+        elif self.engine_type == "pyttsx3":
+            # pyttsx3 synthesizes while it plays
+            with metrics.SPEAK_SECONDS.time(stage="synthesize_and_play"):
+                self._speak_pyttsx3(text)
+    
+    def _cached_audio(self, text: str, render: bool = True) -> Optional[Clip]:
+        """
+        Decoded audio for a phrase from the speech cache, rendering it on a miss
+        
+        Args:
+            text: Phrase to look up
+            render: Whether to synthesize the phrase if it is not cached
+            
+        Returns:
+            Decoded audio, or None if it could not be rendered
+        """
+        suffix = "mp3" if self.engine_type == "gtts" else "wav"
+        key = self._cache_key(text)
+        
+        audio = self.cache.get(key)
+        if audio is not None:
+            metrics.CACHE_LOOKUPS.inc(cache="speech", result="hit")
+            return audio
+        
+        try:
+            path = self.cache.find(key, suffix)
+            if path is not None:
+                metrics.CACHE_LOOKUPS.inc(cache="speech", result="disk_hit")
+                data = path.read_bytes()
+            elif not render:
+                return None
+            elif self.engine_type == "gtts":
+                metrics.CACHE_LOOKUPS.inc(cache="speech", result="miss")
+                data = self._synthesize_mp3(text)
+                self.cache.store(key, suffix, lambda target: target.write_bytes(data))
+            else:
+                metrics.CACHE_LOOKUPS.inc(cache="speech", result="miss")
+                path = self.cache.store(key, suffix, lambda target: self._render_pyttsx3(text, target))
+                if path is None:
+                    return None
+                data = path.read_bytes()
+            
+            audio = decode_audio(data, suffix)
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error loading cached speech: {e}")
+            return None
+        
+        self.cache.put(key, audio)
+        return audio
+    
+    def _cache_key(self, text: str) -> str:
+        """Speech cache key for a phrase with the engine's voice settings"""
+        voice, rate, volume = self._voice_settings
+        return SpeechCache.key(text, self.engine_type, voice, rate, volume)
+    
+    def _render_pyttsx3(self, text: str, path):
+        """Synthesize a phrase into an audio file with pyttsx3"""
+        if not self.engine:
+            raise RuntimeError("no TTS engine available")
+        self.engine.save_to_file(text, str(path))
+        self.engine.runAndWait()
+        if not path.exists():
+            raise RuntimeError("pyttsx3 did not write the audio file")
+    
+    def is_speaking(self) -> bool:
+        """Whether anything is playing or queued to play"""
+        with self._lock:
+            return self._current is not None or bool(self._pending)
+    
+    def stop(self):
+        """Cancel the current utterance and everything queued (e.g. on barge-in)"""
+        with self._lock:
+            self._stops += 1
+            cancelled = self._pending + ([self._current] if self._current else [])
+            self._pending = []
+            speaking = self._current is not None
+        
+        for utterance in cancelled:
+            utterance.cancel()
+        
+        if self.engine_type == "pyttsx3" and self.engine and speaking:
+            try:
+                self.engine.stop()
+            except Exception as e:
+                if config.DEBUG:
+                    print(f"{Fore.RED}Error stopping speech: {e}")
+    
+    def close(self):
+        """Stop speaking and shut down the playback thread"""
+        self.stop()
+        self._queue.put(None)
+        self._worker.join(timeout=1)
+        self.player.close()
     
     def _speak_pyttsx3(self, text: str):
         """Speak using pyttsx3 (offline)"""
@@ -85,41 +449,44 @@ class VoiceOutput:
                 if config.DEBUG:
                     print(f"{Fore.RED}Error speaking: {e}")
     
-    def _speak_gtts(self, text: str):
-        """Speak using gTTS (online)"""
+    def _synthesize_gtts(self, text: str) -> Optional[Clip]:
+        """
+        Synthesize speech with gTTS (online), entirely in memory
+        
+        Returns:
+            Decoded audio, or None on failure
+        """
         try:
-            from gtts import gTTS
-            import tempfile
-            import os
-            from pydub import AudioSegment
-            from pydub.playback import play
-            
-            # Create temporary file
-            temp_file = None
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
-                    temp_file = fp.name
-                
-                # Generate speech
-                tts = gTTS(text=text, lang='en', slow=False)
-                tts.save(temp_file)
-                
-                # Play audio
-                audio = AudioSegment.from_mp3(temp_file)
-                play(audio)
-            finally:
-                # Ensure cleanup even if error occurs
-                if temp_file and os.path.exists(temp_file):
-                    try:
-                        os.remove(temp_file)
-                    except Exception:
-                        pass  # Best effort cleanup
-            
+            return decode_audio(self._synthesize_mp3(text), "mp3")
         except ImportError:
-            print(f"{Fore.RED}gTTS or pydub not available. Install with: pip install gtts pydub")
+            print(f"{Fore.RED}gTTS not available. Install with: pip install gtts")
         except Exception as e:
             if config.DEBUG:
                 print(f"{Fore.RED}Error with gTTS: {e}")
+        return None
+    
+    def _synthesize_mp3(self, text: str) -> bytes:
+        """
+        Fetch mp3 audio for text from Google Translate's TTS, in memory
+        
+        Returns:
+            The mp3 data
+        """
+        if not GTTS_AVAILABLE:
+            raise ImportError("gtts not available")
+        
+        tts = gTTS(text=text, lang='en', slow=False)
+        buffer = io.BytesIO()
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    def _play_audio(self, audio: Clip, utterance: Utterance):
+        """Play decoded audio, stopping early if the utterance is cancelled"""
+        try:
+            self.player.play(audio, should_stop=lambda: utterance.cancelled)
+        except Exception as e:
+            if config.DEBUG:
+                print(f"{Fore.RED}Error playing audio: {e}")
     
     def confirmation_sound(self):
         """Play a confirmation sound when agent is listening"""
@@ -0,0 +1,97 @@
+"""
+Wake Word Module
+Spots the wake word in the microphone stream without full transcription
+"""
+
+import json
+import config
+from recognizers import load_vosk_model
+
+
+class WakeWordSpotter:
+    """
+    Always-on keyword spotter for the wake word
+
+    A Vosk recognizer restricted to a grammar of only the wake word (and
+    "[unk]" for anything else) decodes the audio. With such a small search
+    space it is cheap enough to run continuously, and detections come from
+    partial results, before the speaker pauses. With a voice activity
+    detector, silence is skipped without decoding.
+    """
+
+    def __init__(self, sample_rate: int, wake_word: str = config.WAKE_WORD,
+                 detector=None, model=None):
+        """
+        Args:
+            sample_rate: Sample rate of the audio in Hz
+            wake_word: Phrase to listen for
+            detector: Optional VoiceActivityDetector used to skip silence
+            model: Loaded Vosk model to share (loaded from VOSK_MODEL_PATH if None)
+        """
+        if model is None:
+            model = load_vosk_model()
+        import vosk
+
+        self.wake_word = wake_word.lower()
+        self.sample_rate = sample_rate
+        self.detector = detector
+        self._recognizer = vosk.KaldiRecognizer(
+            model, sample_rate, json.dumps([self.wake_word, "[unk]"])
+        )
+
+        # Audio kept from before speech starts, and silence decoded after it
+        self._preroll_bytes = sample_rate * 2 * config.VAD_PADDING_MS // 1000
+        self._hangover_ms = config.VAD_END_MS
+        self._preroll = b""
+        self._quiet_ms = 0.0
+        self._active = detector is None
+
+    def feed(self, pcm: bytes) -> bool:
+        """
+        Add audio to the stream
+
+        Args:
+            pcm: 16-bit mono PCM in any chunk size
+
+        Returns:
+            True if the wake word was just spoken
+        """
+        if self.detector is None:
+            return self._decode(pcm)
+
+        if self.detector.classify(pcm).any():
+            self._quiet_ms = 0.0
+        else:
+            self._quiet_ms += len(pcm) * 1000 / (2 * self.sample_rate)
+
+        if not self._active:
+            if self._quiet_ms:
+                self._preroll = (self._preroll + pcm)[-self._preroll_bytes:]
+                return False
+            self._active = True
+            pcm, self._preroll = self._preroll + pcm, b""
+
+        detected = self._decode(pcm)
+        if not detected and self._quiet_ms > self._hangover_ms:
+            # Speech ended without the wake word
+            self.reset()
+        return detected
+
+    def reset(self):
+        """Forget audio decoded so far"""
+        self._recognizer.Reset()
+        self._preroll = b""
+        self._quiet_ms = 0.0
+        self._active = self.detector is None
+
+    def _decode(self, pcm: bytes) -> bool:
+        """Decode audio and check the transcript for the wake word"""
+        if self._recognizer.AcceptWaveform(bytes(pcm)):
+            text = json.loads(self._recognizer.Result()).get("text", "")
+        else:
+            text = json.loads(self._recognizer.PartialResult()).get("partial", "")
+
+        if self.wake_word in text:
+            self.reset()
+            return True
+        return False
@@ -0,0 +1,380 @@
+"""
+Worker Pool Module
+Runs agents in several processes, each pinned to its own cores
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Dict, Iterator, List, Optional
+import config
+import metrics
+from colorama import Fore, init
+
+init(autoreset=True)
+
+
+def plan_cores(workers: int, cores: Optional[List[int]] = None) -> List[List[int]]:
+    """
+    Split the usable cores into one contiguous group per worker
+
+    Args:
+        workers: Number of worker processes
+        cores: Cores to split (defaults to the cores this process may use)
+
+    Returns:
+        The cores of each worker; groups differ in size by at most one
+    """
+    if cores is None:
+        if hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+        else:
+            cores = list(range(os.cpu_count() or 1))
+
+    if workers > len(cores):
+        # More workers than cores: share them round-robin
+        return [[cores[i % len(cores)]] for i in range(workers)]
+
+    size, extra = divmod(len(cores), workers)
+    groups, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+def _worker_main(index: int, model_name: str, quantize: bool, speculative: bool,
+                 cores: List[int], threads: int, requests, results):
+    """
+    Entry point of a worker process: load an agent and serve requests one at a time
+
+    Runs in a fresh (spawned) interpreter, so the thread settings take
+    effect before torch is imported.
+    """
+    if config.WORKER_PIN_CORES and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    import torch
+    torch.set_num_threads(threads)
+
+    from ai_agent import AIAgent
+    from sessions import SessionManager
+
+    try:
+        agent = AIAgent(model_name=model_name, quantize=quantize, speculative=speculative)
+        if config.ENABLE_WARMUP:
+            agent.warmup()
+    except Exception as e:
+        results.put((index, None, "error", str(e)))
+        return
+    sessions = SessionManager(agent)
+    results.put((index, None, "ready", os.getpid()))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            return
+        kind, request_id, session_id, text = message
+
+        try:
+            if kind == "command":
+                results.put((index, request_id, "done", sessions.process_command(session_id, text)))
+            elif kind == "stream":
+                for piece in sessions.stream_command(session_id, text):
+                    results.put((index, request_id, "piece", piece))
+                results.put((index, request_id, "done", None))
+            elif kind == "remove":
+                sessions.remove(session_id)
+                continue
+        except Exception as e:
+            results.put((index, request_id, "error", str(e)))
+        # Metrics are recorded here, so the parent only sees what is sent
+        results.put((index, None, "metrics", metrics.REGISTRY.export()))
+
+
+class _Worker:
+    """Parent-side handle of a worker process"""
+
+    def __init__(self, index: int, process, requests, cores: List[int]):
+        self.index = index
+        self.process = process
+        self.requests = requests
+        self.cores = cores
+        self.inflight = 0  # Requests sent and not yet finished
+        self.sessions = 0  # Sessions routed here
+        self.alive = True
+
+
+class _Request:
+    """A request waiting for its worker's reply"""
+
+    __slots__ = ("worker", "future", "pieces")
+
+    def __init__(self, worker: _Worker, stream: bool):
+        self.worker = worker
+        self.future = Future()
+        # Streamed pieces, then None at the end or an exception
+        self.pieces = queue.Queue() if stream else None
+
+
+class WorkerPool:
+    """
+    Several agent processes behind one session-sticky router
+
+    PyTorch intra-op parallelism stops scaling after a few cores and the GIL
+    serializes the rest, so throughput scales better with more processes,
+    each with a few dedicated cores, than with more threads in one process.
+
+    A session always goes to the worker that holds its history. New
+    sessions go to the worker with the fewest requests in flight. Has the
+    same command interface as SessionManager, so InferenceServer can use
+    either.
+    """
+
+    def __init__(self, model_name: str = config.MODEL_NAME,
+                 workers: int = config.WORKER_PROCESSES,
+                 threads: int = config.WORKER_THREADS,
+                 quantize: bool = config.QUANTIZE_INT8,
+                 speculative: bool = config.ENABLE_SPECULATIVE_DECODING):
+        """
+        Start the workers and wait until each has loaded its model
+
+        Args:
+            model_name: Model every worker loads
+            workers: Number of worker processes
+            threads: Torch threads per worker (0 for one per pinned core)
+            quantize: Load the model with int8 quantization (CPU)
+            speculative: Draft tokens with config.DRAFT_MODEL
+        """
+        self.model_name = model_name
+        context = multiprocessing.get_context("spawn")
+        self._results = context.Queue()
+        self._workers: List[_Worker] = []
+        self._requests: Dict[int, _Request] = {}
+        self._routes: "OrderedDict[str, _Worker]" = OrderedDict()
+        self._max_routes = config.MAX_SESSIONS * workers
+        self._ids = itertools.count()
+        self._lock = Lock()
+
+        for index, cores in enumerate(plan_cores(workers)):
+            requests = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(index, model_name, quantize, speculative, cores, threads or len(cores),
+                      requests, self._results),
+                name=f"agent-worker-{index}",
+                daemon=True,
+            )
+            worker = _Worker(index, process, requests, cores)
+            self._workers.append(worker)
+            metrics.QUEUE_DEPTH.set_function(lambda worker=worker: worker.inflight,
+                                             queue=f"worker{index}")
+
+        # The first worker loads alone, so it writes the model snapshot (if
+        # enabled) and the others memory-map it. Unquantized CPU weights are
+        # used straight from the mapping, so the workers share those pages;
+        # int8 or GPU weights are copies, private to each worker
+        print(f"{Fore.YELLOW}Starting {workers} agent workers...")
+        self._workers[0].process.start()
+        self._wait_ready(1)
+        for worker in self._workers[1:]:
+            worker.process.start()
+        self._wait_ready(len(self._workers) - 1)
+
+        self._dispatcher = Thread(target=self._dispatch, name="worker-results", daemon=True)
+        self._dispatcher.start()
+
+        for worker in self._workers:
+            print(f"{Fore.GREEN}Worker {worker.index}: pid {worker.process.pid}, "
+                  f"cores {worker.cores}")
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._routes
+
+    def _wait_ready(self, count: int):
+        """Wait for workers to report that their model is loaded"""
+        while count:
+            try:
+                index, _, kind, payload = self._results.get(timeout=1)
+            except queue.Empty:
+                for worker in self._workers:
+                    if worker.process.exitcode is not None:
+                        self.close()
+                        raise RuntimeError(f"Worker {worker.index} exited while loading "
+                                           f"(code {worker.process.exitcode})")
+                continue
+
+            if kind == "error":
+                self.close()
+                raise RuntimeError(f"Worker {index} failed to start: {payload}")
+            count -= 1
+
+    def _route(self, session_id: str) -> _Worker:
+        """The session's worker, assigning new sessions to the least busy one"""
+        worker = self._routes.get(session_id)
+        if worker is not None and worker.alive:
+            self._routes.move_to_end(session_id)
+            return worker
+
+        alive = [worker for worker in self._workers if worker.alive]
+        if not alive:
+            raise RuntimeError("No agent workers are running")
+        worker = min(alive, key=lambda worker: (worker.inflight, worker.sessions))
+
+        self._routes[session_id] = worker
+        worker.sessions += 1
+        while len(self._routes) > self._max_routes:
+            # The worker forgets idle sessions on its own (SESSION_TTL_SECONDS)
+            _, evicted = self._routes.popitem(last=False)
+            evicted.sessions -= 1
+        return worker
+
+    def _submit(self, kind: str, session_id: str, text: str) -> _Request:
+        """Send a request to the session's worker"""
+        with self._lock:
+            worker = self._route(session_id)
+            request_id = next(self._ids)
+            request = self._requests[request_id] = _Request(worker, stream=kind == "stream")
+            worker.inflight += 1
+        worker.requests.put((kind, request_id, session_id, text))
+        return request
+
+    def submit(self, session_id: str, user_input: str) -> Future:
+        """
+        Queue user input within a session
+
+        Returns:
+            Future resolving to the response text
+        """
+        return self._submit("command", session_id, user_input).future
+
+    def process_command(self, session_id: str, user_input: str) -> str:
+        """
+        Process user input within a session on its worker
+
+        Args:
+            session_id: Unique name of the conversation
+            user_input: User's input text
+
+        Returns:
+            Response text
+        """
+        return self.submit(session_id, user_input).result()
+
+    def stream_command(self, session_id: str, user_input: str) -> Iterator[str]:
+        """
+        Process user input within a session, yielding the response as the worker sends it
+
+        Args:
+            session_id: Unique name of the conversation
+            user_input: User's input text
+
+        Yields:
+            Pieces of the response text, in order
+        """
+        request = self._submit("stream", session_id, user_input)
+        while True:
+            piece = request.pieces.get()
+            if piece is None:
+                return
+            if isinstance(piece, Exception):
+                raise piece
+            yield piece
+
+    def remove(self, session_id: str):
+        """End a session on its worker"""
+        with self._lock:
+            worker = self._routes.pop(session_id, None)
+            if worker is None:
+                return
+            worker.sessions -= 1
+        if worker.alive:
+            worker.requests.put(("remove", None, session_id, None))
+
+    def _dispatch(self):
+        """Hand replies from the workers to the waiting callers"""
+        next_check = time.monotonic() + 1
+        while True:
+            # On a timer, since busy workers may keep the queue from ever running dry
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + 1
+
+            try:
+                index, request_id, kind, payload = self._results.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return  # Closed
+
+            if kind == "metrics":
+                metrics.REGISTRY.merge("worker", str(index), payload)
+                continue
+
+            if kind == "piece":
+                request = self._requests.get(request_id)
+                if request is not None:
+                    request.pieces.put(payload)
+                continue
+
+            with self._lock:
+                request = self._requests.pop(request_id, None)
+                if request is None:
+                    continue
+                request.worker.inflight -= 1
+
+            if kind == "done":
+                self._finish(request, result=payload)
+            else:
+                self._finish(request, error=RuntimeError(payload))
+
+    @staticmethod
+    def _finish(request: _Request, result=None, error: Optional[Exception] = None):
+        """Complete a request's future (and its stream)"""
+        if error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(result)
+        if request.pieces is not None:
+            request.pieces.put(error)
+
+    def _check_workers(self):
+        """Fail the requests of workers that died; their sessions move elsewhere"""
+        for worker in self._workers:
+            if not worker.alive or worker.process.is_alive():
+                continue
+
+            worker.alive = False
+            print(f"{Fore.RED}Agent worker {worker.index} exited "
+                  f"(code {worker.process.exitcode})")
+            with self._lock:
+                lost = [request_id for request_id, request in self._requests.items()
+                        if request.worker is worker]
+                requests = [self._requests.pop(request_id) for request_id in lost]
+                worker.inflight = 0
+            for request in requests:
+                self._finish(request, error=RuntimeError(f"Agent worker {worker.index} exited"))
+
+    def close(self):
+        """Stop the workers"""
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.requests.put(None)
+        for worker in self._workers:
+            if worker.process.pid is None:
+                continue
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.alive = False